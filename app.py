@@ -1,13 +1,29 @@
-import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from functools import lru_cache, partial
+
+import argparse
+import hashlib
+import json
+import re
 
 from dotenv import load_dotenv
 import os
+from services.cleanup_queue import CleanupQueue
+from services.discovery_service import DiscoveryService
+from services.environment_manager import EnvironmentManager
+from services.fingerprint_index import FingerprintIndex
+from services.github_client import GithubClient
 from services.repo_service import RepoService
 from services.workflow_service import WorkflowService
+from services.run_monitor import RunMonitor
 from services.run_service import RunService
+from services.run_tracker import RunTracker
+from services.scan_journal import ScanJournal
+from services.scan_store import ScanStore
 from entities.repo import Repo
 from entities.workflow import Workflow
-from entities.run import Run
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,12 +34,44 @@ owner = os.getenv('OWNER')
 workflow_pattern = os.getenv('WORKFLOW_PATTERN')
 secret_pattern = os.getenv('SECRET_PATTERN')
 branch_name = os.getenv('BRANCH')
+scan_concurrency = int(os.getenv('SCAN_CONCURRENCY', '4'))
+auto_confirm = os.getenv('AUTO_CONFIRM', 'false').lower() == 'true'
+discovery_mode = os.getenv('DISCOVERY_MODE', 'rest')
+discovery_batch_size = int(os.getenv('DISCOVERY_BATCH_SIZE', '50'))
+incremental_scan = os.getenv('INCREMENTAL_SCAN', 'true').lower() == 'true'
+preflight = os.getenv('PREFLIGHT', 'true').lower() == 'true'
+preflight_concurrency = int(os.getenv('PREFLIGHT_CONCURRENCY', '16'))
+warm_branches = os.getenv('WARM_BRANCHES', 'false').lower() == 'true'
 
-repo_serv = RepoService(token, owner)
-workflow_serv = WorkflowService(token, owner)
-run_serv = RunService(token, owner)
+client = GithubClient.shared(token)
+repo_serv = RepoService(token, owner, client)
+environment_manager = EnvironmentManager(repo_serv)
+workflow_serv = WorkflowService(token, owner, client)
+run_serv = RunService(token, owner, client)
+discovery_serv = DiscoveryService(token, owner, client)
+run_tracker = RunTracker(run_serv)
+run_monitor = RunMonitor(token, client)
+metrics = client.metrics
+cleanup_queue = CleanupQueue()
 
 environments = ['st', 'pr']
+# Environments of the secret.yml matrix, whose secrets the workflow run can read.
+workflow_environments = ['qa', 'st', 'pr']
+NO_CANDIDATES = 'no candidates'
+# Seconds a lost dispatch has to show up as a run before it is sent again.
+DISPATCH_VERIFY_WINDOW = 10
+# Environment names mapped to ids per repository, kept for the whole scan.
+environment_ids = {}
+
+
+def iter_repos(regex_pattern):
+    """
+    Get the repositories that match a given pattern as soon as their listing page arrives.
+    Args:regex_pattern (str): Regular expression pattern to filter repositories.
+    Returns: generator: Repo objects that match the pattern.
+    """
+    for rep in repo_serv.filter_repos(pattern=regex_pattern):
+        yield Repo(rep['id'], rep['name'], rep.get('default_branch'))
 
 
 def get_repos(regex_pattern):
@@ -32,10 +80,36 @@ def get_repos(regex_pattern):
     Args:regex_pattern (str): Regular expression pattern to filter repositories.
     Returns: list: List of Repo objects that match the pattern.
     """
-    repo_list = list()
-    for rep in repo_serv.filter_repos(pattern=regex_pattern):
-        repo_list.append(Repo(rep['id'], rep['name']))
-    return repo_list
+    return list(iter_repos(regex_pattern))
+
+
+def discover_repos(repos):
+    """
+    Hydrate repositories with their default branch, workflows and environments using batched
+    GraphQL queries when DISCOVERY_MODE is 'graphql'.
+    Args: repos (iterable): Repo objects to hydrate.
+    Returns: iterable: Repo objects, hydrated when discovery is enabled.
+    """
+    if discovery_mode != 'graphql':
+        return repos
+    return discovery_serv.discover((repo.name for repo in repos), batch_size=discovery_batch_size)
+
+
+def get_secret_metadata(repo_name):
+    """
+    Get the names and update dates of the secrets a scan run can read, filtered by SECRET_PATTERN.
+    Args: repo_name (str): Repository name.
+    Returns: dict: Scope ('repo', 'org' or an environment) mapped to secret name mapped to updated_at.
+    """
+    p = re.compile(secret_pattern or '')
+    with metrics.span('preflight', repo_name):
+        scopes = {
+            'repo': repo_serv.list_secrets(repo_name),
+            'org': repo_serv.list_organization_secrets(repo_name),
+            **{env: repo_serv.list_secrets(repo_name, env) for env in workflow_environments},
+        }
+    return {scope: {secret['name']: secret['updated_at'] for secret in secrets if p.search(secret['name'])}
+            for scope, secrets in scopes.items()}
 
 
 def get_secret_workflow(repo_name):
@@ -49,67 +123,113 @@ def get_secret_workflow(repo_name):
     return Workflow(res['id'], res['name']), res['path'].replace('.github/workflows/', '')
 
 
-def start_workflow(repo_name, workflow_id, access_key_id, branch, secret_regx):
+def start_workflow(repo_name, workflow_id, access_key_ids, branch, secret_regx, fingerprint_salt=None,
+                   dispatched_at=None):
     """
     Start the execution of a workflow in a given repository.
     Args:
         repo_name (str): Repository name.
         workflow_id (str): Workflow ID.
-        access_key_id (str): Access key ID.
+        access_key_ids (list): Access key IDs checked in the same run.
         branch (str): Branch name.
         secret_regx (str): Pattern to search for secrets.
+        fingerprint_salt (str, optional): Salt of the fingerprints to report for the index.
+        dispatched_at (datetime, optional): Time taken right before the dispatch. When given, a dispatch that
+            fails in transit is only sent again if no run shows up for it.
     Returns: dict: Response from the GitHub API.
     """
-    return workflow_serv.dispatch_workflow(repo_name, workflow_id, access_key_id, branch, secret_regx)
+    verify = None
+    if dispatched_at is not None:
+        def verify():
+            try:
+                run_tracker.find_run(repo_name, workflow_id, branch, dispatched_at, DISPATCH_VERIFY_WINDOW)
+                return True
+            except TimeoutError:
+                return False
+    return workflow_serv.dispatch_workflow(repo_name, workflow_id, access_key_ids, branch, secret_regx,
+                                           fingerprint_salt, verify)
 
 
-def get_run(repo_name, workflow_id):
+def get_secrets(repo_name, run_id, access_key_ids, fingerprint_index=None):
     """
-    Get the status of a workflow execution in a given repository.
+    Get the secrets found in the execution of a workflow in a given repository.
     Args:
         repo_name (str): Repository name.
-        workflow_id (str): Workflow ID.
-    Returns: Run: Run object representing the execution.
+        run_id (str): Run ID.
+        access_key_ids (list): Access key IDs the run was dispatched with.
+        fingerprint_index (FingerprintIndex, optional): Index that stores the fingerprints reported by the run.
+    Returns: dict: Whether each filtered secret matches, per access key and environment.
     """
-    result = None
-    for _ in range(5):
-        time.sleep(10)
-        try:
-            res = run_serv.get_run_status(repo_name, workflow_id)['workflow_runs'][0]
-            result = Run(res['id'], res['status'])
-            break
-        except:
-            logger.error(f"Attempt {_ + 1} for get run status failed.")
-    return result
+    payloads = run_serv.get_result_payloads(repo_name, run_id)
+    missing = set(workflow_environments) - {payload['environment'] for payload in payloads}
+    if missing:
+        raise RuntimeError(f"Run {run_id} of {repo_name} uploaded no results for {', '.join(sorted(missing))}.")
+    if fingerprint_index is not None:
+        fingerprint_index.replace_repo(repo_name, {p['environment']: p.get('fingerprints', {}) for p in payloads})
+    return run_serv.results_by_key(payloads, access_key_ids)
 
 
-def get_secrets(repo_name, run_id):
+@lru_cache(maxsize=None)
+def read_workflow_template():
     """
-    Get the secrets found in the execution of a workflow in a given repository.
+    Read the secret.yml template once per scan.
+    Returns: str: Content of the template.
+    """
+    with open(os.getcwd() + "/secret.yml", 'r') as file:
+        return file.read()
+
+
+@lru_cache(maxsize=None)
+def template_blob_sha():
+    """
+    Compute the git blob SHA of the secret.yml template, the SHA GitHub reports for the file once committed.
+    Returns: str: Hex SHA-1 of the blob.
+    """
+    content = read_workflow_template().encode('utf-8')
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+def is_branch_warm(repo_name, branch, workflow_filename, state):
+    """
+    Check that a scan branch kept from a previous scan is still ready to dispatch: the workflow file on the
+    branch is the current template and every environment still allows the branch. The reads are revalidated
+    with ETags, so an unchanged branch costs no rate limit.
     Args:
         repo_name (str): Repository name.
-        run_id (str): Run ID.
-    Returns: dict: Secrets found in the execution.
+        branch (str): Branch name.
+        workflow_filename (str): Workflow file name.
+        state (dict): Scan branch recorded in the warm store.
+    Returns: bool: Whether the scan can be dispatched without provisioning.
     """
-    return run_serv.get_logs(repo_name, run_id)
+    remote_path = f'.github/workflows/{workflow_filename}'
+    if (state['branch'], state['workflow_path'], state['blob_sha']) != (branch, remote_path, template_blob_sha()):
+        return False
+    if repo_serv.get_file_sha(repo_name, remote_path, branch) != template_blob_sha():
+        return False
+    return all(environment_manager.is_prepared(environment_manager.snapshot(repo_name, env), branch)
+               for env in environments)
 
 
-def create_branch_and_update_workflow(repo_name, branch, workflow_filename):
+def create_branch_and_update_workflow(repo, branch, workflow_filename, on_branch_created=None,
+                                      on_environment_prepared=None):
     """
-    Create a branch in a repository and update the workflow file in the branch.
+    Create a branch in a repository with the workflow file replaced by the secret.yml template, in a single
+    commit on top of the head of the repository default branch, and open the environments to the branch.
     Args:
-        repo_name (str): Repository name.
+        repo (Repo): Repository, with its default branch head when it was discovered.
         branch (str): Branch name.
         workflow_filename (str): Workflow file name.
+        on_branch_created (callable, optional): Called without arguments once the branch exists.
+        on_environment_prepared (callable, optional): Called with the name and the state of every environment
+            as soon as it is opened.
+    Returns: dict: Environment states to restore once the scan is done.
     """
-    repo_serv.create_branch(repo_name, branch)
-    [repo_serv.update_environment(repo_name, env) for env in environments]
-    # [repo_serv.update_environment(repo_name, env) for env in ['pr', 'st']]
-    local_path = os.getcwd() + "/secret.yml"
     remote_path = f'.github/workflows/{workflow_filename}'
-    print(workflow_filename)
-    repo_serv.update_workflow(repo_name, branch, remote_path, local_path)
-    # repo_serv.upload_workflow(repo_name, branch, remote_path, workflow_name)
+    repo_serv.provision_branch(repo.name, branch, remote_path, read_workflow_template(),
+                               repo.head_sha, repo.tree_sha, repo.default_branch)
+    if on_branch_created is not None:
+        on_branch_created()
+    return environment_manager.prepare(repo.name, environments, branch, on_environment_prepared)
 
 
 def delete_branch_and_logs(repo_name, branch, run_id):
@@ -124,70 +244,456 @@ def delete_branch_and_logs(repo_name, branch, run_id):
     run_serv.delete_logs(repo_name, run_id)
 
 
-def approve_workflow_run(repo, run_id):
+def get_environment_ids(repo, run_id, known_environments=None):
+    """
+    Get the ids of the 'pr' and 'st' environments, cached per repository for the whole scan.
+    On a miss they are read from the pending deployments of the run, which the approval needs anyway.
+    Args:
+        repo (str): Repository name.
+        run_id (str): Run ID waiting for approval.
+        known_environments (dict, optional): Environment names mapped to ids, when already discovered.
+    Returns: list: Environment IDs.
+    """
+    ids = environment_ids.setdefault(repo, dict(known_environments or {}))
+    if not all(env in ids for env in environments):
+        ids.update({deployment['environment']['name']: deployment['environment']['id']
+                    for deployment in run_serv.list_pending_deployments(repo, run_id)})
+    return [ids[env] for env in environments if env in ids]
+
+
+def approve_workflow_run(repo, run_id, known_environments=None):
     """
     Approve a workflow run in the 'pr' and 'st' environments.
     Args:
         repo (str): Repository name.
         run_id (str): Run ID.
+        known_environments (dict, optional): Environment names mapped to ids, when already discovered.
     Returns: dict: Response from the GitHub API.
     """
-    environments_list = []
-    [environments_list.append(env['id']) for env in run_serv.list_environments(repo)['environments'] if env['name'] in ['pr', 'st']]
-    response = run_serv.approve_pending_deployments(repo, run_id, environments_list)
+    response = run_serv.approve_pending_deployments(repo, run_id, get_environment_ids(repo, run_id, known_environments))
+    print(f"Approved code: {response.status_code}")
+    response.raise_for_status()
     return response
 
 
-if __name__ == '__main__':
-    pattern_input = input('Ingrese el patron para filtrar repositorios: \n')
-    access_key_id = input('Ingrese la llave a buscar: \n')
+def scan_repo(repo, access_key_ids, fingerprint_index=None, scan_store=None, metadata=None, warm_store=None,
+              journal=None):
+    """
+    Run the secret comparison for a single repository. With a scan store, keys whose stored result is still
+    valid for the current secret metadata are answered from the store and only the rest are dispatched.
+    Args:
+        repo (Repo): Repository to scan.
+        access_key_ids (list): Access key IDs to look for, all checked by a single run.
+        fingerprint_index (FingerprintIndex, optional): Index to fill with the fingerprints of the repo secrets.
+        scan_store (ScanStore, optional): Store of previous results.
+        metadata (dict, optional): Secret metadata already read by the pre-flight stage.
+        warm_store (ScanStore, optional): Store of the scan branches kept between scans, in warm mode.
+        journal (ScanJournal, optional): Journal of the scan.
+    Returns: dict: Whether each filtered secret matches, per access key and environment.
+    """
+    with metrics.span('repo', repo.name):
+        if scan_store is None or fingerprint_index is not None:
+            return run_scan(repo, access_key_ids, fingerprint_index, warm_store, journal)
+        if metadata is None:
+            metadata = get_secret_metadata(repo.name)
+        metadata_hash = scan_store.metadata_hash(metadata, secret_pattern)
+        stored = scan_store.get_results(repo.name, access_key_ids, metadata_hash)
+        pending = [key for key in access_key_ids if key not in stored]
+        if not pending:
+            logger.info(f"{repo.name} unchanged since its last scan, reusing stored results.")
+            return stored
+        # run_scan raises unless the run succeeded with results for every environment, so a partial or empty
+        # result never becomes valid for this metadata.
+        found_secrets = run_scan(repo, pending, fingerprint_index, warm_store, journal)
+        scan_store.save_metadata(repo.name, metadata)
+        scan_store.save_results(repo.name, found_secrets, metadata_hash)
+        return {**stored, **found_secrets}
+
+
+def checkpoint(journal, repo_name, state, stage, **data):
+    """
+    Record a stage of a repository scan in the journal, when there is one.
+    Args:
+        journal (ScanJournal): Journal of the scan, or None.
+        repo_name (str): Repository name.
+        state (dict): State of the repository so far.
+        stage (str): Stage reached.
+        **data: Details of the stage.
+    Returns: dict: State of the repository including the stage.
+    """
+    if journal is not None:
+        journal.record(repo_name, stage, **data)
+    return {**state, **data, 'stage': stage, 'stages': state.get('stages', []) + [stage]}
+
+
+def clean_up_scan(repo_name, state, done=None):
+    """
+    Delete the scan branch and the run logs of a repository and restore its environments, unless warm mode
+    keeps them. Every step runs even when another one fails, and their errors are raised together at the end.
+    Args:
+        repo_name (str): Repository name.
+        state (dict): State of the repository scan, as recorded in the journal.
+        done (set, optional): Steps already done, the ones that succeed are added to it so that a retry given
+            the same set only redoes the failed ones.
+    """
+    def delete_branch():
+        if not repo_serv.delete_branch(repo_name, branch_name):
+            raise RuntimeError(f"Could not delete the scan branch of {repo_name}.")
+
+    def delete_run():
+        if not run_serv.delete_logs(repo_name, state['run_id']):
+            raise RuntimeError(f"Could not delete run {state['run_id']} of {repo_name}.")
+
+    def restore_environments():
+        environment_manager.restore(repo_name, state.get('environments') or {})
+
+    steps = {}
+    if not state.get('warm'):
+        steps['branch'] = delete_branch
+    if state.get('run_id'):
+        steps['run'] = delete_run
+    if not state.get('warm'):
+        steps['environments'] = restore_environments
+    done = set() if done is None else done
+    errors = []
+    with metrics.span('cleanup', repo_name):
+        for name, step in steps.items():
+            if name in done:
+                continue
+            try:
+                step()
+                done.add(name)
+            except Exception as error:
+                logger.warning(f"Clean up step {name} of {repo_name} failed: {error}")
+                errors.append(error)
+    if errors:
+        raise RuntimeError(f"Clean up of {repo_name} failed: {'; '.join(str(error) for error in errors)}")
+
+
+def run_scan(repo, access_key_ids, fingerprint_index=None, warm_store=None, journal=None):
+    """
+    Provision and dispatch the secret workflow in a repository, handing the clean up to the background queue.
+    In warm mode the scan branch and the environment policies are kept for the next scan, and reused as long
+    as they still match the template.
+    With a journal every stage is recorded, and a repository found half done in it resumes from its last
+    stage instead of being provisioned and dispatched again.
+    Args:
+        repo (Repo): Repository to scan.
+        access_key_ids (list): Access key IDs to look for, all checked by a single run.
+        fingerprint_index (FingerprintIndex, optional): Index to fill with the fingerprints of the repo secrets.
+        warm_store (ScanStore, optional): Store of the scan branches kept between scans, in warm mode.
+        journal (ScanJournal, optional): Journal of the scan.
+    Returns: dict: Whether each filtered secret matches, per access key and environment.
+    """
+    state = (journal.state(repo.name) if journal is not None else None) or {}
+    if state:
+        logger.info(f"Resuming {repo.name} after its '{state['stage']}' stage.")
+    if not ScanJournal.reached(state, 'provisioned'):
+        with metrics.span('provision', repo.name):
+            if repo.workflows:
+                workflow = repo.workflows[0]
+                workflow_filename = workflow.id
+            else:
+                workflow, workflow_filename = get_secret_workflow(repo.name)
+            warm_state = warm_store.get_warm_branch(repo.name) if warm_store is not None else None
+            if warm_state is not None and is_branch_warm(repo.name, branch_name, workflow_filename, warm_state):
+                logger.info(f"{repo.name} scan branch is warm, dispatching right away.")
+                environment_states = warm_state['environments']
+            else:
+                # Environments opened by an interrupted provisioning keep the snapshot taken before it.
+                interrupted = state.get('environments') or {}
+                prepared = {}
+                prepared_lock = threading.Lock()
+
+                def environment_prepared(env, env_state):
+                    with prepared_lock:
+                        prepared[env] = env_state
+                        checkpoint(journal, repo.name, state, 'environment_prepared',
+                                   environments=environment_manager.merge(interrupted, prepared))
+
+                branch_created = partial(checkpoint, journal, repo.name, state, 'branch_created')
+                environment_states = environment_manager.merge(interrupted, create_branch_and_update_workflow(
+                    repo, branch_name, workflow_filename, branch_created, environment_prepared))
+                if warm_store is not None:
+                    if warm_state is not None:
+                        environment_states = environment_manager.merge(warm_state['environments'],
+                                                                       environment_states)
+                    warm_store.save_warm_branch(repo.name, branch_name, f'.github/workflows/{workflow_filename}',
+                                                template_blob_sha(), environment_states)
+        state = checkpoint(journal, repo.name, state, 'provisioned', workflow_id=workflow.id,
+                           workflow_filename=workflow_filename, environments=environment_states,
+                           warm=warm_store is not None)
+    if not ScanJournal.reached(state, 'dispatched'):
+        dispatched_at = run_tracker.now()
+        salt = fingerprint_index.salt if fingerprint_index is not None else None
+        with metrics.span('dispatch', repo.name):
+            response = start_workflow(repo.name, state['workflow_id'], access_key_ids, branch_name, secret_pattern,
+                                      salt, dispatched_at)
+        print(response)
+        # A rejected dispatch never starts a run, it must not be journaled as dispatched.
+        if response is not None:
+            response.raise_for_status()
+        state = checkpoint(journal, repo.name, state, 'dispatched', dispatched_at=dispatched_at.isoformat(),
+                           access_key_ids=access_key_ids)
+    # A resumed run was dispatched with the keys pending at the time.
+    access_key_ids = state['access_key_ids']
+    if not ScanJournal.reached(state, 'run'):
+        with metrics.span('find_run', repo.name):
+            run = run_tracker.find_run(repo.name, state['workflow_filename'], branch_name,
+                                       datetime.fromisoformat(state['dispatched_at']))
+        state = checkpoint(journal, repo.name, state, 'run', run_id=run.id)
+    elif not ScanJournal.reached(state, 'results'):
+        # Past the results, the run may be gone already.
+        run = run_tracker.to_run(run_serv.get_run(repo.name, state['run_id']))
+
+    def approve(waiting):
+        with metrics.span('approve', repo.name):
+            approve_workflow_run(repo.name, waiting.id, repo.environments)
+        checkpoint(journal, repo.name, state, 'approved')
+
+    if not ScanJournal.reached(state, 'results'):
+        with metrics.span('wait_run', repo.name):
+            run = run_monitor.wait(run, ('completed',), on_waiting=approve)
+        if run.conclusion != 'success':
+            # A cancelled or failed run has partial results at best, they would read as a clean 'no match'.
+            raise RuntimeError(f"Run {run.id} of {repo.name} finished with conclusion {run.conclusion}.")
+        with metrics.span('results', repo.name):
+            found_secrets = get_secrets(repo.name, run.id, access_key_ids, fingerprint_index)
+        state = checkpoint(journal, repo.name, state, 'results', results=found_secrets)
+        print(f"{repo.name} verified!")
+    if not ScanJournal.reached(state, 'cleaned'):
+        cleanup_queue.submit(f"clean up of {repo.name}", clean_up_scan, repo.name, state, set(),
+                             on_done=partial(checkpoint, journal, repo.name, state, 'cleaned'))
+    return state['results']
+
+
+def clean_up_orphans(journal):
+    """
+    Clean up the repositories left half done in the journal, e.g. by a previous scan that died or by repos
+    that failed, and make the journal forget them so that they are scanned from scratch next time.
+    The clean ups go through the background queue, which is drained before returning.
+    Args: journal (ScanJournal): Journal of the scan.
+    Returns: list: Names of the repositories cleaned up.
+    """
+    def clean_up(repo_name, state, done):
+        if ScanJournal.reached(state, 'dispatched') and not state.get('run_id'):
+            # The dispatch went through but the run was never found, look for it once more to cancel it.
+            try:
+                run = run_tracker.find_run(repo_name, state['workflow_filename'], branch_name,
+                                           datetime.fromisoformat(state['dispatched_at']), DISPATCH_VERIFY_WINDOW)
+                state = {**state, 'run_id': run.id}
+            except TimeoutError:
+                logger.warning(f"No run of the dispatch in {repo_name} showed up, nothing to cancel.")
+        if state.get('run_id') and not ScanJournal.reached(state, 'results'):
+            run_serv.cancel_run(repo_name, state['run_id'])
+        if ScanJournal.reached(state, 'provisioned') and not ScanJournal.reached(state, 'cleaned'):
+            clean_up_scan(repo_name, state, done)
+        elif ScanJournal.reached(state, 'branch_created'):
+            # Provisioning stopped half way: warm mode never kept this branch, so it is always deleted.
+            clean_up_scan(repo_name, {**state, 'warm': False}, done)
+
+    def forget(repo_name):
+        journal.record(repo_name, 'abandoned')
+        cleaned.append(repo_name)
+
+    cleaned = []
+    for repo_name, state in journal.unfinished().items():
+        cleanup_queue.submit(f"clean up of {repo_name}", clean_up, repo_name, state, set(),
+                             on_done=partial(forget, repo_name))
+    cleanup_queue.drain()
+    return cleaned
+
+
+def open_journal(pattern, access_key_ids, resume=True):
+    """
+    Open the journal of a scan, resuming it when the previous scan had the same inputs and cleaning up after
+    it otherwise.
+    Args:
+        pattern (str): Regular expression pattern the repositories are filtered with.
+        access_key_ids (list): Access key IDs to look for.
+        resume (bool, optional): Whether the previous scan may be resumed. An index is rebuilt from scratch, so
+            its repositories must all be scanned again. Defaults to True.
+    Returns: ScanJournal: Journal of the scan.
+    """
+    scan_key = hashlib.sha256(json.dumps([pattern, sorted(access_key_ids), secret_pattern]).encode()).hexdigest()
+    journal = ScanJournal()
+    if resume and journal.scan_key == scan_key:
+        logger.info(f"Resuming the scan journaled in {journal.path}.")
+        return journal
+    if journal.scan_key is not None:
+        clean_up_orphans(journal)
+    journal.reset(scan_key)
+    return journal
+
+
+def close_journal(journal):
+    """
+    Remove the journal of a finished scan, unless some repository is still not cleaned up. The journal is then
+    kept so that the next scan resumes or cleans up after it.
+    Args: journal (ScanJournal): Journal of the scan.
+    """
+    unfinished = journal.unfinished()
+    if unfinished:
+        print(f"Could not clean up after {', '.join(sorted(unfinished))}, kept the journal in {journal.path}")
+    else:
+        journal.remove()
+
+
+def teardown(warm_store):
+    """
+    Delete the scan branches kept by warm mode and restore the environments to their original config.
+    Args: warm_store (ScanStore): Store of the scan branches kept between scans.
+    Returns: list: Names of the repositories torn down.
+    """
+    def teardown_repo(repo_name, state):
+        # The record is the only trace of the branch, it is kept until the branch is really gone.
+        if not repo_serv.delete_branch(repo_name, state['branch']):
+            raise RuntimeError(f"Could not delete the scan branch of {repo_name}.")
+        environment_manager.restore(repo_name, state['environments'])
+        warm_store.delete_warm_branch(repo_name)
+        return repo_name
+
+    torn_down = []
+    with ThreadPoolExecutor(max_workers=scan_concurrency) as executor:
+        futures = {executor.submit(teardown_repo, repo_name, state): repo_name
+                   for repo_name, state in warm_store.list_warm_branches().items()}
+        for future in as_completed(futures):
+            try:
+                torn_down.append(future.result())
+            except Exception:
+                logger.exception(f"Failed to tear down the scan branch of {futures[future]}")
+    return torn_down
+
+
+def scan_repos(repos, access_key_ids, max_workers=scan_concurrency, fingerprint_index=None, scan_store=None,
+               warm_store=None, journal=None):
+    """
+    Scan several repositories concurrently, keeping at most max_workers of them in flight.
+    A pre-flight stage first reads the secret names of each repository and reports the ones without any
+    secret matching SECRET_PATTERN as 'no candidates' instead of scanning them.
+    A failure in one repository is logged and does not stop the others.
+    Clean ups run in the background while the next repositories are scanned, and are waited for before
+    returning. With a journal, repositories it already has results for are not scanned again, and the
+    repositories left half done once every scan is over are cleaned up.
+    Args:
+        repos (iterable): Repo objects to scan.
+        access_key_ids (list): Access key IDs to look for.
+        max_workers (int, optional): Maximum number of repositories scanned at once.
+        fingerprint_index (FingerprintIndex, optional): Index to fill with the fingerprints of the repo secrets.
+        scan_store (ScanStore, optional): Store of previous results for incremental scans.
+        warm_store (ScanStore, optional): Store of the scan branches kept between scans, in warm mode.
+        journal (ScanJournal, optional): Journal of the scan.
+    Returns: dict: Secrets found per repository name.
+    """
     output = {}
+    futures = {}
+    lock = threading.Lock()
+
+    def start_scan(executor, repo, preflight_future=None):
+        metadata = None
+        if preflight_future is not None:
+            try:
+                metadata = preflight_future.result()
+            except Exception:
+                logger.exception(f"Pre-flight failed for {repo.name}, scanning it anyway.")
+        if metadata is not None and not any(metadata.values()):
+            logger.info(f"{repo.name} has no secret matching the pattern, skipping it.")
+            with lock:
+                output[repo.name] = NO_CANDIDATES
+            if journal is not None:
+                journal.record(repo.name, 'done', results=NO_CANDIDATES)
+            return
+        future = executor.submit(scan_repo, repo, access_key_ids, fingerprint_index, scan_store, metadata, warm_store,
+                                 journal)
+        with lock:
+            futures[future] = repo
 
-    repos = get_repos(pattern_input)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        with ThreadPoolExecutor(max_workers=preflight_concurrency) as preflight_pool:
+            for repo in discover_repos(repos):
+                state = journal.state(repo.name) if journal is not None else None
+                if ScanJournal.reached(state, 'done'):
+                    with lock:
+                        output[repo.name] = state['results']
+                    continue
+                if preflight:
+                    preflight_pool.submit(get_secret_metadata, repo.name).add_done_callback(
+                        partial(start_scan, executor, repo))
+                else:
+                    start_scan(executor, repo)
+        for future in as_completed(futures):
+            repo = futures[future]
+            try:
+                output[repo.name] = future.result()
+            except Exception:
+                logger.exception(f"Failed to compare secrets in {repo.name}")
+                continue
+            if journal is not None:
+                journal.record(repo.name, 'done', results=output[repo.name])
+    cleanup_queue.drain()
+    if journal is not None:
+        clean_up_orphans(journal)
+    return output
+
+
+def select_repos(pattern):
+    """
+    List the repositories matching a pattern and ask for confirmation, unless AUTO_CONFIRM is set.
+    Args: pattern (str): Regular expression pattern to filter repositories.
+    Returns: iterable: Repo objects to scan.
+    """
+    if auto_confirm:
+        # Matching repos are scanned while the rest of the listing is still being fetched.
+        return iter_repos(pattern)
     print("Repositorios a comparar:")
-    [print(repo.name) for repo in repos]
+    repos = []
+    for repo in iter_repos(pattern):
+        print(repo.name)
+        repos.append(repo)
     print("\n")
     if input("Desea continuar(y/n): ") != "y":
         exit("Programa terminado por el usuario")
-    for repo in get_repos(pattern_input):
-        try:
-            workflow, workflow_filename = get_secret_workflow(repo.name)
-            create_branch_and_update_workflow(repo.name, branch_name, workflow_filename)
-            print(start_workflow(repo.name, workflow.id, access_key_id, branch_name, secret_pattern))
-            run = get_run(repo.name, workflow_filename)
-            if run.status == 'waiting':
-                res = approve_workflow_run(repo.name, run.id)
-                print(f"Approved code: {res.status_code}")
-                time.sleep(5)
-                run = get_run(repo.name, workflow_filename)
-            found_secrets = get_secrets(repo.name, run.id)
-            delete_branch_and_logs(repo.name, branch_name, run.id)
-            # print(found_secrets)
-            output[repo.name] = found_secrets
-            print(f"{repo.name} verified!")
-            try:
-                repo_serv.update_environment(repo.name, 'st', True)
-            except:
-                logger.error("Error updating st environment to default protected branches.")
-        except:
-            logger.error(f"Failed to compare secrets in {repo.name}")
-    print(output)
-
-    # repo = Repo(token, owner)
-    # workflow = Workflow(token, owner)
-    # run = Run(token, owner)
-    # repos = repo.filter_repos(pattern=pattern)
-    # [print(repo['name']) for repo in repos]
-    # workflows = workflow.get_workflows(repos[0]['name'], workflow_pattern)
-    # [print(workflow) for workflow in workflows]
-    # workflow.dispatch_workflow(repos[0]['name'], workflows[0]['id'], '1234567890')
-    # print(workflow.get_workflow_status(repos[0]['name']))
-    # repo_id = repos[0]['name']
-    # for i in range(5):
-    #     time.sleep(20)
-    #     runs = workflow.get_workflow_status(repo_id)['workflow_runs']
-    #     if len(runs) > 0:
-    #         break
-    # [print(run) for run in runs if run['name'] == 'secret workflow']
-    # found_secrets = run.get_logs(repo_id, runs[0]['id'])
-    # print(found_secrets)
+    return repos
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='GitHub Repository Secrets Comparator')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.add_parser('scan', help='Look for access keys in the secrets of the repositories (default).')
+    subparsers.add_parser('index', help='Fingerprint the secrets of the repositories into the local index.')
+    lookup_parser = subparsers.add_parser('lookup', help='Find access keys in the local index.')
+    lookup_parser.add_argument('keys', nargs='+')
+    subparsers.add_parser('shared', help='Report secret values shared between repositories from the local index.')
+    subparsers.add_parser('teardown', help='Delete the scan branches kept by warm mode.')
+    args = parser.parse_args()
+
+    if args.command == 'lookup':
+        fingerprint_index = FingerprintIndex()
+        print({key: fingerprint_index.lookup(key) for key in args.keys})
+    elif args.command == 'shared':
+        [print(entries) for entries in FingerprintIndex().shared()]
+    elif args.command == 'teardown':
+        print(f"Torn down: {teardown(ScanStore())}")
+    elif args.command == 'index':
+        pattern_input = input('Ingrese el patron para filtrar repositorios: \n')
+        journal = open_journal(pattern_input, [], resume=False)
+        repos = select_repos(pattern_input)
+        fingerprint_index = FingerprintIndex()
+        fingerprint_index.reset()
+        scan_repos(repos, [], fingerprint_index=fingerprint_index, journal=journal)
+        fingerprint_index.save()
+        close_journal(journal)
+        print(f"Indexed {len(fingerprint_index.repos)} repositories in {fingerprint_index.path}")
+    else:
+        pattern_input = input('Ingrese el patron para filtrar repositorios: \n')
+        access_key_ids = [key.strip() for key in input('Ingrese las llaves a buscar separadas por coma: \n').split(',')
+                          if key.strip()]
+        journal = open_journal(pattern_input, access_key_ids)
+        repos = select_repos(pattern_input)
+        store = ScanStore() if incremental_scan or warm_branches else None
+        output = scan_repos(repos, access_key_ids, scan_store=store if incremental_scan else None,
+                            warm_store=store if warm_branches else None, journal=journal)
+        print(output)
+        close_journal(journal)
+    logger.info(f"Connection stats: {client.connection_stats()}")
+    metrics.export()
@@ -1,5 +1,11 @@
 class Repo:
 
-    def __init__(self, id, name):
+    def __init__(self, id, name, default_branch=None, head_sha=None, tree_sha=None, workflows=None,
+                 environments=None):
         self.id = id
         self.name = name
+        self.default_branch = default_branch
+        self.head_sha = head_sha
+        self.tree_sha = tree_sha
+        self.workflows = workflows or []
+        self.environments = environments or {}
\ No newline at end of file
@@ -1,6 +1,9 @@
 class Run:
     
-    def __init__(self, id, status):
+    def __init__(self, id, status, conclusion=None, created_at=None, node_id=None):
         self.id = id
         self.status = status
+        self.conclusion = conclusion
+        self.created_at = created_at
+        self.node_id = node_id
         
\ No newline at end of file
@@ -1,5 +1,6 @@
 class Workflow:
 
-    def __init__(self, id, name):
+    def __init__(self, id, name, path=None):
         self.id = id
         self.name = name
+        self.path = path
\ No newline at end of file
@@ -0,0 +1,97 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+
+class CleanupQueue:
+    """
+    Runs clean up tasks in the background, with their own concurrency and retries, so that the scans don't
+    wait for them.
+    """
+
+    def __init__(self, max_workers=None, retries=None, backoff=None):
+        """
+        Initializes the CleanupQueue.
+        Args:
+            max_workers (int, optional): Tasks run at once. Defaults to CLEANUP_CONCURRENCY or 4.
+            retries (int, optional): Retries of a failing task. Defaults to CLEANUP_RETRIES or 3.
+            backoff (float, optional): Seconds before the first retry, doubled on every retry.
+                Defaults to CLEANUP_BACKOFF or 2.
+        """
+        self.max_workers = int(max_workers or os.getenv('CLEANUP_CONCURRENCY', '4'))
+        self.retries = int(os.getenv('CLEANUP_RETRIES', '3') if retries is None else retries)
+        self.backoff = float(os.getenv('CLEANUP_BACKOFF', '2') if backoff is None else backoff)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='cleanup')
+        self.futures = set()
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def submit(self, name, task, *args, on_done=None):
+        """
+        Queues a clean up task. Tasks must be safe to run again, since a failing one is retried from the start.
+        Args:
+            name (str): Name of the task for the logs.
+            task (callable): Function to run.
+            *args: Arguments of the function.
+            on_done (callable, optional): Called without arguments once the task succeeded.
+        Returns: (Future) Future of the task.
+        """
+        future = self.executor.submit(self._run, name, task, args, on_done)
+        with self._lock:
+            self.futures.add(future)
+        future.add_done_callback(self._forget)
+        return future
+
+    def _forget(self, future):
+        with self._lock:
+            self.futures.discard(future)
+
+    def _run(self, name, task, args, on_done):
+        for attempt in range(self.retries + 1):
+            try:
+                result = task(*args)
+                break
+            except Exception:
+                if attempt == self.retries:
+                    logger.exception(f"Gave up on {name} after {attempt + 1} attempts.")
+                    with self._lock:
+                        self.failed += 1
+                    raise
+                delay = self.backoff * 2 ** attempt
+                logger.warning(f"{name} failed, retrying in {delay:.0f}s.")
+                time.sleep(delay)
+        if on_done is not None:
+            on_done()
+        return result
+
+    def pending(self):
+        """
+        Returns the number of tasks queued or running.
+        Returns: (int) Tasks not finished yet.
+        """
+        with self._lock:
+            return len(self.futures)
+
+    def drain(self, timeout=None):
+        """
+        Waits for every queued task, including the ones queued while waiting. Tasks that failed for good
+        are logged and counted in failed.
+        Args: timeout (float, optional): Seconds to wait overall. Defaults to no limit.
+        Returns: (int) Tasks still queued or running when the timeout expired.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                futures = set(self.futures)
+            if not futures:
+                return 0
+            _, not_done = wait(futures, None if end is None else max(end - time.monotonic(), 0))
+            if not_done and end is not None and time.monotonic() >= end:
+                return len(not_done)
@@ -0,0 +1,103 @@
+import logging
+
+from entities.repo import Repo
+from entities.workflow import Workflow
+from services.github_client import GithubClient
+
+logger = logging.getLogger(__name__)
+
+REPO_FIELDS = """
+fragment RepoFields on Repository {
+  databaseId
+  name
+  defaultBranchRef {
+    name
+    target {
+      oid
+      ... on Commit { tree { oid } }
+    }
+  }
+  workflows: object(expression: "HEAD:.github/workflows") {
+    ... on Tree { entries { name path type } }
+  }
+  environments(first: 100) {
+    nodes { databaseId name }
+  }
+}
+"""
+
+
+class DiscoveryService:
+    """
+    A class that gathers everything needed to plan a scan through batched GitHub GraphQL queries.
+    """
+
+    def __init__(self, token, owner, client=None):
+        """
+        Initializes the DiscoveryService.
+        Args:
+            token (str): GitHub authentication token.
+            owner (str): Repository owner username.
+            client (GithubClient, optional): Shared HTTP client. Defaults to the client shared for the token.
+        """
+        self.token = token
+        self.owner = owner
+        self.client = client or GithubClient.shared(token)
+        self.api_url = self.client.api_url
+
+    @staticmethod
+    def build_query(size):
+        """
+        Builds a query that reads `size` repositories at once, one alias per repository.
+        Args: size (int): Number of repositories in the batch.
+        Returns: (str) GraphQL document using the variables $owner and $n0..$n{size-1}.
+        """
+        names = ', '.join(f'$n{i}: String!' for i in range(size))
+        aliases = '\n'.join(f'  r{i}: repository(owner: $owner, name: $n{i}) {{ ...RepoFields }}' for i in range(size))
+        return f'query($owner: String!, {names}) {{\n{aliases}\n}}\n{REPO_FIELDS}'
+
+    def discover(self, repo_names, batch_size=50):
+        """
+        Reads id, default branch head, workflow files and environments of many repositories.
+        Args:
+            repo_names (iterable): Repository names.
+            batch_size (int, optional): Repositories per query. Defaults to 50.
+        Returns: generator: Hydrated Repo objects, one batch at a time.
+        """
+        batch = []
+        for name in repo_names:
+            batch.append(name)
+            if len(batch) == batch_size:
+                yield from self._discover_batch(batch)
+                batch = []
+        if batch:
+            yield from self._discover_batch(batch)
+
+    def _discover_batch(self, names):
+        variables = {'owner': self.owner, **{f'n{i}': name for i, name in enumerate(names)}}
+        data = self.client.graphql(self.build_query(len(names)), variables)
+        for i, name in enumerate(names):
+            node = data.get(f'r{i}')
+            if node is None:
+                logger.error(f"Couldn't discover repository {name}")
+                continue
+            yield self.to_repo(node)
+
+    @staticmethod
+    def to_repo(node):
+        """
+        Converts a repository node of the discovery query into a Repo.
+        Args: node (dict): Repository node.
+        Returns: (Repo) Hydrated repository.
+        """
+        branch = node.get('defaultBranchRef') or {}
+        target = branch.get('target') or {}
+        entries = (node.get('workflows') or {}).get('entries') or []
+        workflows = [
+            Workflow(entry['name'], entry['name'], entry['path'])
+            for entry in entries
+            if entry['type'] == 'blob' and entry['name'].endswith(('.yml', '.yaml'))
+        ]
+        environments = {env['name']: env['databaseId'] for env in (node.get('environments') or {}).get('nodes', [])}
+        return Repo(node['databaseId'], node['name'], branch.get('name'), target.get('oid'),
+                    (target.get('tree') or {}).get('oid'), workflows, environments)
@@ -0,0 +1,186 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class EnvironmentManager:
+    """
+    Opens the environments of a repository to the scan branch and puts them back the way they were.
+    Every environment is snapshotted before it is changed, the changes are applied to all environments
+    concurrently, and nothing is written when an environment already allows the branch.
+    """
+
+    def __init__(self, repo_service):
+        """
+        Initializes the EnvironmentManager.
+        Args: repo_service (RepoService): Service used to read and write the environments.
+        """
+        self.repo_service = repo_service
+
+    @staticmethod
+    def policy_name(branch):
+        """
+        Returns the deployment branch policy pattern allowing a branch.
+        Args: branch (str): Branch name.
+        Returns: (str) Branch name pattern.
+        """
+        return f'*{branch}*'
+
+    def snapshot(self, repo, environment_name):
+        """
+        Reads the protection config of an environment.
+        Args:
+            repo (str): Repository name.
+            environment_name (str): Name of the environment.
+        Returns: (dict) Whether the environment exists, the config to put it back with and its branch policies.
+        """
+        environment = self.repo_service.get_environment(repo, environment_name)
+        if environment is None:
+            return {'exists': False, 'config': None, 'policies': {}}
+        config = {'wait_timer': 0, 'prevent_self_review': False, 'reviewers': [],
+                  'deployment_branch_policy': environment.get('deployment_branch_policy'),
+                  # Left out of a PUT it goes back to GitHub's default, letting admins bypass the rules.
+                  'can_admins_bypass': environment.get('can_admins_bypass', True)}
+        for rule in environment.get('protection_rules', []):
+            if rule['type'] == 'wait_timer':
+                config['wait_timer'] = rule['wait_timer']
+            elif rule['type'] == 'required_reviewers':
+                config['prevent_self_review'] = rule.get('prevent_self_review', False)
+                config['reviewers'] = [{'type': r['type'], 'id': r['reviewer']['id']} for r in rule['reviewers']]
+        policies = {}
+        if (config['deployment_branch_policy'] or {}).get('custom_branch_policies'):
+            policies = {p['name']: p['id']
+                        for p in self.repo_service.list_deployment_branch_policies(repo, environment_name)}
+        return {'exists': True, 'config': config, 'policies': policies}
+
+    def is_prepared(self, snapshot, branch):
+        """
+        Tells whether an environment already lets the branch deploy without waiting.
+        Args:
+            snapshot (dict): Snapshot of the environment.
+            branch (str): Branch name.
+        Returns: (bool) Whether nothing needs to be written.
+        """
+        config = snapshot['config']
+        return (snapshot['exists'] and config['wait_timer'] == 0
+                and (config['deployment_branch_policy'] or {}).get('custom_branch_policies', False)
+                and self.policy_name(branch) in snapshot['policies'])
+
+    def prepare_environment(self, repo, environment_name, branch):
+        """
+        Snapshots an environment and opens it to the branch, keeping its reviewers.
+        Args:
+            repo (str): Repository name.
+            environment_name (str): Name of the environment.
+            branch (str): Branch name.
+        Returns: (dict) What restore needs: the original snapshot, whether it was updated and the created policy.
+        """
+        original = self.snapshot(repo, environment_name)
+        state = {'original': original, 'updated': False, 'created_policy': None}
+        if self.is_prepared(original, branch):
+            logger.info(f"{environment_name} environment already allows {branch}.")
+            return state
+        config = original['config'] or {'prevent_self_review': False, 'reviewers': [], 'can_admins_bypass': True}
+        if not (original['exists'] and config['wait_timer'] == 0
+                and (config['deployment_branch_policy'] or {}).get('custom_branch_policies', False)):
+            self.repo_service.put_environment(repo, environment_name, {
+                **config,
+                'wait_timer': 0,
+                'deployment_branch_policy': {'protected_branches': False, 'custom_branch_policies': True},
+            })
+            state['updated'] = True
+        if self.policy_name(branch) not in original['policies']:
+            try:
+                policy = self.repo_service.create_deployment_branch_policy(repo, environment_name,
+                                                                           self.policy_name(branch))
+            except Exception:
+                self.restore_environment(repo, environment_name, state)
+                raise
+            state['created_policy'] = policy['id'] if policy else None
+        logger.info(f"{environment_name} environment updated successfully.")
+        return state
+
+    def prepare(self, repo, environment_names, branch, on_prepared=None):
+        """
+        Opens several environments to the branch concurrently.
+        When an environment fails, the ones already opened are restored before the error is raised.
+        Args:
+            repo (str): Repository name.
+            environment_names (list): Names of the environments.
+            branch (str): Branch name.
+            on_prepared (callable, optional): Called with the environment name and its state as soon as each
+                environment is opened, e.g. to journal what restore needs.
+        Returns: (dict) Environment name mapped to the state restore needs.
+        """
+        def prepare_one(env):
+            state = self.prepare_environment(repo, env, branch)
+            if on_prepared is not None:
+                try:
+                    on_prepared(env, state)
+                except Exception:
+                    self.restore_environment(repo, env, state)
+                    raise
+            return state
+
+        with ThreadPoolExecutor(max_workers=max(len(environment_names), 1)) as executor:
+            futures = {env: executor.submit(prepare_one, env) for env in environment_names}
+        states, error = {}, None
+        for env, future in futures.items():
+            try:
+                states[env] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to open the {env} environment of {repo} to {branch}: {e}")
+                error = error or e
+        if error is not None:
+            self.restore(repo, states)
+            raise error
+        return states
+
+    def restore_environment(self, repo, environment_name, state):
+        """
+        Puts an environment back the way it was before prepare_environment.
+        Args:
+            repo (str): Repository name.
+            environment_name (str): Name of the environment.
+            state (dict): State returned by prepare_environment.
+        """
+        if state['created_policy'] is not None:
+            self.repo_service.delete_deployment_branch_policy(repo, environment_name, state['created_policy'])
+        if not state['updated']:
+            return
+        if state['original']['exists']:
+            self.repo_service.put_environment(repo, environment_name, state['original']['config'])
+        else:
+            self.repo_service.delete_environment(repo, environment_name)
+        logger.info(f"{environment_name} environment restored.")
+
+    def restore(self, repo, states):
+        """
+        Puts several environments back concurrently.
+        Args:
+            repo (str): Repository name.
+            states (dict): Environment name mapped to the state returned by prepare.
+        """
+        with ThreadPoolExecutor(max_workers=max(len(states), 1)) as executor:
+            futures = [executor.submit(self.restore_environment, repo, env, state) for env, state in states.items()]
+            for future in futures:
+                future.result()
+
+    @staticmethod
+    def merge(previous, current):
+        """
+        Combines the states of two prepares of the same environments, keeping the oldest snapshot so that
+        restore goes back to the config found before the first one.
+        Args:
+            previous (dict): States of the first prepare.
+            current (dict): States of the later prepare.
+        Returns: (dict) Environment name mapped to the combined state.
+        """
+        merged = dict(current)
+        for env, state in previous.items():
+            later = current.get(env, {'updated': False, 'created_policy': None})
+            merged[env] = {'original': state['original'],
+                           'updated': state['updated'] or later['updated'],
+                           'created_policy': later['created_policy'] or state['created_policy']}
+        return merged
@@ -0,0 +1,110 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+
+class FingerprintIndex:
+    """
+    A local index of HMAC fingerprints of secret values, mapping each fingerprint to the
+    repositories, environments and secret names holding that value.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initializes the FingerprintIndex, loading it from disk when it exists.
+        Args: path (str, optional): JSON file of the index. Defaults to FINGERPRINT_INDEX or .cache/fingerprints.json.
+        """
+        self.path = path or os.getenv('FINGERPRINT_INDEX', '.cache/fingerprints.json')
+        self.salt = None
+        self.created_at = None
+        self.repos = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                data = json.load(file)
+            self.salt = data['salt']
+            self.created_at = data['created_at']
+            self.repos = data['repos']
+
+    def reset(self):
+        """
+        Starts a new index with a fresh salt, dropping every stored fingerprint.
+        Returns: (str) Salt the indexing scan must send to the workflow.
+        """
+        with self._lock:
+            self.salt = secrets.token_hex(16)
+            self.created_at = time.time()
+            self.repos = {}
+        return self.salt
+
+    def fingerprint(self, value):
+        """
+        Computes the fingerprint of a value with the salt of the index, the same way the workflow does.
+        Args: value (str): Secret value or access key.
+        Returns: (str) Hex HMAC-SHA256 digest.
+        """
+        return hmac.new(self.salt.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+    def replace_repo(self, repo, fingerprints):
+        """
+        Stores the fingerprints reported by a repository, replacing the previous ones.
+        Args:
+            repo (str): Repository name.
+            fingerprints (dict): Environment mapped to secret name mapped to fingerprint.
+        """
+        with self._lock:
+            self.repos[repo] = fingerprints
+
+    def save(self):
+        """
+        Writes the index to disk.
+        """
+        with self._lock:
+            data = {'salt': self.salt, 'created_at': self.created_at, 'repos': self.repos}
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(data, file)
+        os.replace(tmp_name, self.path)
+
+    def by_fingerprint(self):
+        """
+        Inverts the index.
+        Returns: (dict) Fingerprint mapped to (repo, environment, secret name) tuples.
+        """
+        result = {}
+        with self._lock:
+            for repo, environments in self.repos.items():
+                for env, fingerprints in environments.items():
+                    for name, fingerprint in fingerprints.items():
+                        result.setdefault(fingerprint, []).append((repo, env, name))
+        return result
+
+    def lookup(self, access_key_id):
+        """
+        Finds where a key is stored without running any workflow.
+        Args: access_key_id (str): Access key to look for.
+        Returns: (list) (repo, environment, secret name) tuples holding the key.
+        """
+        if self.salt is None:
+            raise ValueError("The fingerprint index is empty, run an indexing scan first.")
+        return self.by_fingerprint().get(self.fingerprint(access_key_id), [])
+
+    def shared(self):
+        """
+        Finds secret values stored in more than one repository.
+        Returns: (list) Lists of (repo, environment, secret name) tuples sharing the same value.
+        """
+        return [entries for entries in self.by_fingerprint().values() if len({repo for repo, _, _ in entries}) > 1]
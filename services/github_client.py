@@ -0,0 +1,280 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, \
+    as_completed, wait
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from services.http_cache import HttpCache
+from services.metrics import Metrics
+from services.rate_limiter import RateLimiter
+from services.retry_policy import RetryPolicy
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+
+class GithubClient:
+    """
+    A shared HTTP client for the GitHub API that keeps connections alive between calls.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, token, api_url=None, pool_size=None, timeout=None, rate_limiter=None, cache=None,
+                 retry_policy=None, metrics=None):
+        """
+        Initializes the GithubClient.
+        Args:
+            token (str): GitHub authentication token.
+            api_url (str, optional): Base URL of the GitHub API. Defaults to GITHUB_API_URL or api.github.com.
+            pool_size (int, optional): Connections kept per host. Defaults to HTTP_POOL_SIZE or 20.
+            timeout (float, optional): Seconds to wait for a response. Defaults to HTTP_TIMEOUT or 30.
+            rate_limiter (RateLimiter, optional): Scheduler that paces the calls. Defaults to a new RateLimiter.
+            cache (HttpCache, optional): Conditional request cache, False to disable it. Defaults to a new HttpCache unless
+                HTTP_CACHE_DIR is set to an empty value.
+            retry_policy (RetryPolicy, optional): Retries of transient failures. Defaults to a new RetryPolicy.
+            metrics (Metrics, optional): Collector every call is recorded in. Defaults to a new Metrics.
+        """
+        self.token = token
+        self.api_url = (api_url or os.getenv('GITHUB_API_URL', 'https://api.github.com')).rstrip('/')
+        self.pool_size = int(pool_size or os.getenv('HTTP_POOL_SIZE', '20'))
+        self.timeout = float(timeout or os.getenv('HTTP_TIMEOUT', '30'))
+        self.headers = {
+            'Accept': 'application/vnd.github+json',
+            'Authorization': f'Bearer {self.token}',
+            'X-GitHub-Api-Version': '2022-11-28',
+        }
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size, pool_block=True)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_rate_limit_retries = int(os.getenv('RATE_LIMIT_RETRIES', '3'))
+        if cache is None and os.getenv('HTTP_CACHE_DIR', '.cache/github'):
+            cache = HttpCache()
+        self.cache = cache
+        self.refresh_cache = os.getenv('HTTP_CACHE_REFRESH', 'false').lower() == 'true'
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.metrics = metrics or Metrics()
+        self._hedge_executor = None
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, token):
+        """
+        Returns the client shared by every service that uses the same token.
+        Args: token (str): GitHub authentication token.
+        Returns: (GithubClient) Shared client instance.
+        """
+        with cls._shared_lock:
+            if token not in cls._shared:
+                cls._shared[token] = cls(token)
+            return cls._shared[token]
+
+    def request(self, method, url, deadline=None, **kwargs):
+        """
+        Sends a request through the pooled session. Idempotent requests are sent again after a connection error
+        or a transient server error, with jittered exponential backoff, until the deadline.
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute URL of the endpoint.
+            deadline (float, optional): Seconds the call may take including its retries. Defaults to the deadline
+                of the retry policy. Every attempt also stops after the client timeout.
+            **kwargs: Extra arguments for requests.Session.request.
+        Returns: (requests.Response) Response from the GitHub API.
+        """
+        end = time.monotonic() + (deadline or self.retry_policy.deadline)
+        timeout = kwargs.pop('timeout', self.timeout)
+        host = urlparse(url).netloc
+        retry = self.retry_policy.is_idempotent(method)
+        failures = rate_limited = 0
+        while True:
+            self.rate_limiter.acquire(method, url)
+            attempt_timeout = timeout if isinstance(timeout, tuple) else max(min(timeout, end - time.monotonic()), 1)
+            started = time.monotonic()
+            try:
+                response = self._send(method, url, dict(kwargs, timeout=attempt_timeout))
+            except requests.exceptions.RequestException as e:
+                self.metrics.record_call(method, url, None, time.monotonic() - started)
+                self._count(host, 'errors')
+                delay = self.retry_policy.delay(failures)
+                if not retry or failures >= self.retry_policy.retries or time.monotonic() + delay > end:
+                    raise
+                logger.warning(f"{method} {url} failed with {e}, retrying in {delay:.1f}s.")
+                failures += 1
+                time.sleep(delay)
+                continue
+            self._record(method, url, response, time.monotonic() - started, kwargs.get('stream'))
+            self._count(host, 'requests')
+            if self.rate_limiter.update(response) is not None and rate_limited < self.max_rate_limit_retries:
+                rate_limited += 1
+                response.close()
+                continue
+            if retry and self.retry_policy.is_retryable(response) and failures < self.retry_policy.retries:
+                delay = self.retry_policy.delay(failures)
+                if time.monotonic() + delay <= end:
+                    logger.warning(f"{method} {url} answered {response.status_code}, retrying in {delay:.1f}s.")
+                    failures += 1
+                    response.close()
+                    time.sleep(delay)
+                    continue
+            return response
+
+    def _record(self, method, url, response, latency, stream):
+        # A streamed body isn't downloaded yet, its size is only known from the headers.
+        size = int(response.headers.get('Content-Length') or 0) if stream else len(response.content)
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        self.metrics.record_call(method, url, response.status_code, latency, size,
+                                 response.headers.get('X-RateLimit-Resource'),
+                                 int(remaining) if remaining is not None else None)
+
+    def _send(self, method, url, kwargs):
+        hedge_after = self.retry_policy.hedge_after
+        if method.upper() != 'GET' or not hedge_after or kwargs.get('stream'):
+            return self.session.request(method, url, **kwargs)
+        with self._stats_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='hedge')
+        first = self._hedge_executor.submit(self.session.request, method, url, **kwargs)
+        try:
+            return first.result(timeout=hedge_after)
+        except FutureTimeoutError:
+            pass
+        self._count(urlparse(url).netloc, 'hedged')
+        second = self._hedge_executor.submit(self.session.request, method, url, **kwargs)
+        done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = next(iter(done))
+        loser = second if winner is first else first
+        if winner.exception() is not None:
+            return loser.result()
+        loser.add_done_callback(lambda future: future.exception() is None and future.result().close())
+        return winner.result()
+
+    def get(self, url, cache=False, refresh=False, **kwargs):
+        """
+        Sends a GET request, optionally revalidating a cached copy with If-None-Match.
+        Args:
+            url (str): Absolute URL of the endpoint.
+            cache (bool, optional): Whether the response may be served from the cache. Defaults to False.
+            refresh (bool, optional): Ignore the cached copy and store a fresh one. Defaults to False.
+            **kwargs: Extra arguments for requests.Session.request.
+        Returns: (requests.Response) Response from the GitHub API or rebuilt from the cache.
+        """
+        if not cache or not self.cache:
+            return self.request('GET', url, **kwargs)
+        params = kwargs.get('params')
+        entry = None if refresh or self.refresh_cache else self.cache.get(url, params)
+        if entry:
+            kwargs['headers'] = {**kwargs.get('headers', {}), 'If-None-Match': entry['etag']}
+        response = self.request('GET', url, **kwargs)
+        if response.status_code == 304 and entry:
+            self.cache.touch(url, params, entry)
+            return self._cached_response(response, entry)
+        self.cache.set(url, params, response)
+        return response
+
+    def graphql(self, query, variables):
+        """
+        Runs a GraphQL query.
+        Args:
+            query (str): GraphQL document.
+            variables (dict): Query variables.
+        Returns: (dict) The data of the response.
+        """
+        response = self.post(f'{self.api_url}/graphql', json={'query': query, 'variables': variables})
+        response.raise_for_status()
+        body = response.json()
+        for error in body.get('errors', []):
+            logger.warning(f"GraphQL error: {error.get('message')}")
+        return body.get('data') or {}
+
+    def paginate(self, url, params=None, per_page=100, key=None, cache=False, **kwargs):
+        """
+        Yields the items of a paginated listing. The first page is read alone to find the last page
+        in the Link header, then the remaining pages are fetched concurrently and yielded as they arrive.
+        Args:
+            url (str): Absolute URL of the listing.
+            params (dict, optional): Extra query string parameters.
+            per_page (int, optional): Items per page. Defaults to 100.
+            key (str, optional): Field holding the items when the body is an object.
+            cache (bool, optional): Whether pages may be served from the cache. Defaults to False.
+            **kwargs: Extra arguments for requests.Session.request.
+        Returns: generator: Items of every page.
+        """
+        params = {**(params or {}), 'per_page': per_page, 'page': 1}
+        first = self._get_page(url, params, key, cache, kwargs)
+        yield from first[1]
+        last = first[0].links.get('last')
+        if not last:
+            return
+        last_page = int(parse_qs(urlparse(last['url']).query)['page'][0])
+        if last_page < 2:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.pool_size, last_page - 1)) as executor:
+            futures = [executor.submit(self._get_page, url, {**params, 'page': page}, key, cache, kwargs)
+                       for page in range(2, last_page + 1)]
+            for future in as_completed(futures):
+                yield from future.result()[1]
+
+    def _get_page(self, url, params, key, cache, kwargs):
+        response = self.get(url, cache=cache, params=params, **kwargs)
+        response.raise_for_status()
+        data = response.json()
+        return response, data[key] if key else data
+
+    @staticmethod
+    def _cached_response(not_modified, entry):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update(not_modified.headers)
+        response.headers.update(entry['headers'])
+        response._content = entry['body'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.from_cache = True
+        return response
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request('PATCH', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def _count(self, host, field):
+        with self._stats_lock:
+            stats = self._stats.setdefault(host, {'requests': 0, 'errors': 0})
+            stats[field] = stats.get(field, 0) + 1
+
+    def connection_stats(self):
+        """
+        Returns request and connection counters per host.
+        Returns: (dict) Host mapped to requests sent, errors, hedged requests, connections opened and idle connections.
+        """
+        with self._stats_lock:
+            result = {host: dict(stats) for host, stats in self._stats.items()}
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = key.key_host if key.key_port in (None, 80, 443) else f'{key.key_host}:{key.key_port}'
+            stats = result.setdefault(host, {'requests': 0, 'errors': 0})
+            stats['connections_opened'] = stats.get('connections_opened', 0) + pool.num_connections
+            stats['idle_connections'] = stats.get('idle_connections', 0) + (pool.pool.qsize() if pool.pool else 0)
+        return result
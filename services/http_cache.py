@@ -0,0 +1,141 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+
+class HttpCache:
+    """
+    An on-disk cache of GitHub API responses keyed by URL, revalidated with ETags.
+    """
+
+    KEPT_HEADERS = ('ETag', 'Link', 'Content-Type')
+
+    def __init__(self, path=None, ttl=None, max_entries=None):
+        """
+        Initializes the HttpCache.
+        Args:
+            path (str, optional): Directory where the entries are stored. Defaults to HTTP_CACHE_DIR or .cache/github.
+            ttl (float, optional): Seconds an entry is kept without being revalidated. Defaults to HTTP_CACHE_TTL or 1 day.
+            max_entries (int, optional): Entries kept before the oldest are evicted.
+                Defaults to HTTP_CACHE_MAX_ENTRIES or 5000.
+        """
+        self.path = path or os.getenv('HTTP_CACHE_DIR', '.cache/github')
+        self.ttl = float(ttl if ttl is not None else os.getenv('HTTP_CACHE_TTL', '86400'))
+        self.max_entries = int(max_entries if max_entries is not None else os.getenv('HTTP_CACHE_MAX_ENTRIES', '5000'))
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = len(self._entry_files())
+
+    @staticmethod
+    def key(url, params=None):
+        """
+        Builds the cache key of a request.
+        Args:
+            url (str): Endpoint URL.
+            params (dict, optional): Query string parameters.
+        Returns: (str) Hex digest identifying the request.
+        """
+        query = urlencode(sorted((params or {}).items()))
+        return hashlib.sha256(f'{url}?{query}'.encode('utf-8')).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, f'{key}.json')
+
+    def _entry_files(self):
+        return [os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith('.json')]
+
+    def get(self, url, params=None):
+        """
+        Returns the stored entry of a request, dropping it when it is older than the TTL.
+        Args:
+            url (str): Endpoint URL.
+            params (dict, optional): Query string parameters.
+        Returns: (dict) Entry with etag, headers and body, or None.
+        """
+        file_name = self._file(self.key(url, params))
+        try:
+            with open(file_name, 'r') as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry['stored_at'] > self.ttl:
+            self._remove(file_name)
+            return None
+        return entry
+
+    def set(self, url, params, response):
+        """
+        Stores a successful response that carries an ETag.
+        Args:
+            url (str): Endpoint URL.
+            params (dict): Query string parameters.
+            response (requests.Response): Response from the GitHub API.
+        """
+        if response.status_code != 200 or 'ETag' not in response.headers:
+            return
+        entry = {
+            'url': url,
+            'etag': response.headers['ETag'],
+            'headers': {name: response.headers[name] for name in self.KEPT_HEADERS if name in response.headers},
+            'body': response.text,
+            'stored_at': time.time(),
+        }
+        self._write(self._file(self.key(url, params)), entry)
+
+    def touch(self, url, params, entry):
+        """
+        Marks an entry as fresh after the server confirmed it with a 304.
+        Args:
+            url (str): Endpoint URL.
+            params (dict): Query string parameters.
+            entry (dict): Entry returned by get.
+        """
+        entry['stored_at'] = time.time()
+        self._write(self._file(self.key(url, params)), entry)
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        for file_name in self._entry_files():
+            self._remove(file_name)
+
+    def _write(self, file_name, entry):
+        is_new = not os.path.exists(file_name)
+        fd, tmp_name = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        with os.fdopen(fd, 'w') as file:
+            json.dump(entry, file)
+        os.replace(tmp_name, file_name)
+        if is_new:
+            with self._lock:
+                self._size += 1
+                evict = self._size > self.max_entries
+            if evict:
+                self._evict()
+
+    def _remove(self, file_name):
+        try:
+            os.remove(file_name)
+        except OSError:
+            return
+        with self._lock:
+            self._size -= 1
+
+    def _evict(self):
+        files = sorted(self._entry_files(), key=lambda name: os.path.getmtime(name) if os.path.exists(name) else 0)
+        overflow = len(files) - int(self.max_entries * 0.9)
+        logger.info(f"Evicting {max(overflow, 0)} entries from the HTTP cache.")
+        for file_name in files[:max(overflow, 0)]:
+            self._remove(file_name)
+        with self._lock:
+            self._size = len(self._entry_files())
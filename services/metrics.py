@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+# Rewrites of the variable parts of GitHub API paths, applied in order, so calls group by endpoint.
+ENDPOINT_TEMPLATES = [
+    (re.compile(r'^/repos/[^/]+/[^/]+'), '/repos/{owner}/{repo}'),
+    (re.compile(r'^/(users|orgs)/[^/]+'), r'/\1/{owner}'),
+    (re.compile(r'/git/refs?/heads/.+$'), '/git/refs/heads/{branch}'),
+    (re.compile(r'/contents/.+$'), '/contents/{path}'),
+    (re.compile(r'/commits/[^/]+'), '/commits/{ref}'),
+    (re.compile(r'/environments/[^/]+'), '/environments/{environment}'),
+    (re.compile(r'/workflows/[^/]+'), '/workflows/{workflow}'),
+    (re.compile(r'/\d+(?=/|$)'), '/{id}'),
+]
+
+
+def endpoint_template(url):
+    """
+    Turns the URL of a call into the endpoint it belongs to.
+    Args: url (str): Absolute URL of the call.
+    Returns: (str) Path with its variable parts replaced, e.g. /repos/{owner}/{repo}/actions/runs/{id}.
+    """
+    path = urlparse(url).path
+    for pattern, replacement in ENDPOINT_TEMPLATES:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def summarize(values):
+    """
+    Summarizes a list of durations.
+    Args: values (list): Durations in seconds.
+    Returns: (dict) Count, sum, max and the QUANTILES as p50, p90, p95 and p99.
+    """
+    ordered = sorted(values)
+    summary = {'count': len(ordered), 'sum': sum(ordered), 'max': ordered[-1] if ordered else 0}
+    for quantile in QUANTILES:
+        summary[f'p{int(quantile * 100)}'] = ordered[min(int(quantile * len(ordered)), len(ordered) - 1)] if ordered else 0
+    return summary
+
+
+class Metrics:
+    """
+    Collects the latency, status and size of every GitHub API call and the duration of every stage of the
+    repository scans, and exports them as a JSON report or a Prometheus textfile.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty Metrics collector.
+        """
+        self.started_at = time.time()
+        self.calls = {}
+        self.stages = {}
+        self.rate_limit = {}
+        self._lock = threading.Lock()
+
+    def record_call(self, method, url, status, latency, size=0, resource=None, remaining=None):
+        """
+        Records a call to the GitHub API.
+        Args:
+            method (str): HTTP method.
+            url (str): Absolute URL of the call.
+            status (int): Status code, or None when no response came back.
+            latency (float): Seconds until the response headers arrived.
+            size (int, optional): Bytes of the response body.
+            resource (str, optional): Rate limit resource of the call, from X-RateLimit-Resource.
+            remaining (int, optional): Calls left in the rate limit window, from X-RateLimit-Remaining.
+        """
+        key = (method.upper(), endpoint_template(url))
+        with self._lock:
+            call = self.calls.setdefault(key, {'latencies': [], 'statuses': {}, 'bytes': 0})
+            call['latencies'].append(latency)
+            call['statuses'][status] = call['statuses'].get(status, 0) + 1
+            call['bytes'] += size
+            if resource and remaining is not None:
+                headroom = self.rate_limit.setdefault(resource, {'remaining': remaining, 'min_remaining': remaining})
+                headroom['remaining'] = remaining
+                headroom['min_remaining'] = min(headroom['min_remaining'], remaining)
+
+    @contextmanager
+    def span(self, stage, repo=None):
+        """
+        Times a stage of a repository scan. A stage left by an exception is counted as a failure.
+        Args:
+            stage (str): Name of the stage, e.g. 'provision'.
+            repo (str, optional): Repository name, for the logs.
+        """
+        started = time.monotonic()
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            duration = time.monotonic() - started
+            with self._lock:
+                record = self.stages.setdefault(stage, {'durations': [], 'failures': 0})
+                record['durations'].append(duration)
+                record['failures'] += failed
+            logger.debug(f"{repo or ''} {stage} took {duration:.3f}s{' and failed' if failed else ''}")
+
+    def report(self):
+        """
+        Builds the summary of everything recorded so far.
+        Returns: (dict) Per endpoint and per stage counts and latency percentiles, and the rate limit headroom.
+        """
+        with self._lock:
+            calls = {method_endpoint: dict(call, latencies=list(call['latencies']), statuses=dict(call['statuses']))
+                     for method_endpoint, call in self.calls.items()}
+            stages = {stage: dict(record, durations=list(record['durations'])) for stage, record in self.stages.items()}
+            rate_limit = {resource: dict(headroom) for resource, headroom in self.rate_limit.items()}
+        return {
+            'started_at': self.started_at,
+            'duration': time.time() - self.started_at,
+            'calls': [{'method': method, 'endpoint': endpoint, 'bytes': call['bytes'],
+                       'statuses': {str(status): count for status, count in call['statuses'].items()},
+                       'latency': summarize(call['latencies'])}
+                      for (method, endpoint), call in sorted(calls.items())],
+            'stages': {stage: {'failures': record['failures'], 'latency': summarize(record['durations'])}
+                       for stage, record in sorted(stages.items())},
+            'rate_limit': rate_limit,
+        }
+
+    def prometheus(self):
+        """
+        Renders the report in the Prometheus text exposition format, for the node exporter textfile collector.
+        Returns: (str) Metrics text.
+        """
+        report = self.report()
+        lines = [
+            '# TYPE github_api_request_duration_seconds summary',
+            '# TYPE github_api_requests_total counter',
+            '# TYPE github_api_response_bytes_total counter',
+        ]
+        for call in report['calls']:
+            labels = f'method="{call["method"]}",endpoint="{call["endpoint"]}"'
+            lines += summary_lines('github_api_request_duration_seconds', labels, call['latency'])
+            lines += [f'github_api_requests_total{{{labels},status="{status}"}} {count}'
+                      for status, count in call['statuses'].items()]
+            lines.append(f'github_api_response_bytes_total{{{labels}}} {call["bytes"]}')
+        lines += ['# TYPE scan_stage_duration_seconds summary', '# TYPE scan_stage_failures_total counter']
+        for stage, record in report['stages'].items():
+            labels = f'stage="{stage}"'
+            lines += summary_lines('scan_stage_duration_seconds', labels, record['latency'])
+            lines.append(f'scan_stage_failures_total{{{labels}}} {record["failures"]}')
+        lines.append('# TYPE github_rate_limit_remaining gauge')
+        lines += [f'github_rate_limit_remaining{{resource="{resource}"}} {headroom["min_remaining"]}'
+                  for resource, headroom in report['rate_limit'].items()]
+        return '\n'.join(lines) + '\n'
+
+    def export(self, json_path=None, prometheus_path=None):
+        """
+        Writes the report to the configured files, replacing them atomically.
+        Args:
+            json_path (str, optional): JSON report file. Defaults to METRICS_JSON or .cache/metrics.json,
+                empty to skip it.
+            prometheus_path (str, optional): Prometheus textfile. Defaults to METRICS_PROM, empty to skip it.
+        """
+        json_path = os.getenv('METRICS_JSON', '.cache/metrics.json') if json_path is None else json_path
+        prometheus_path = os.getenv('METRICS_PROM', '') if prometheus_path is None else prometheus_path
+        if json_path:
+            write_atomically(json_path, json.dumps(self.report(), indent=2))
+            logger.info(f"Metrics report written to {json_path}")
+        if prometheus_path:
+            write_atomically(prometheus_path, self.prometheus())
+            logger.info(f"Prometheus metrics written to {prometheus_path}")
+
+
+def summary_lines(name, labels, latency):
+    lines = [f'{name}{{{labels},quantile="{quantile}"}} {latency[f"p{int(quantile * 100)}"]:.6f}'
+             for quantile in QUANTILES]
+    return lines + [f'{name}_sum{{{labels}}} {latency["sum"]:.6f}', f'{name}_count{{{labels}}} {latency["count"]}']
+
+
+def write_atomically(path, content):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        file.write(content)
+    os.replace(tmp_name, path)
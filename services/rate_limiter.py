@@ -0,0 +1,111 @@
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+
+class RateLimiter:
+    """
+    Paces GitHub API calls using the rate limit headers returned by previous responses.
+    """
+
+    WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+    SECONDARY_LIMIT_WAIT = 60
+
+    def __init__(self, reserve=None, write_interval=None):
+        """
+        Initializes the RateLimiter.
+        Args:
+            reserve (int, optional): Requests left unused before waiting for the reset.
+                Defaults to RATE_LIMIT_RESERVE or 20.
+            write_interval (float, optional): Minimum seconds between write calls.
+                Defaults to WRITE_INTERVAL or 1.
+        """
+        self.reserve = int(reserve if reserve is not None else os.getenv('RATE_LIMIT_RESERVE', '20'))
+        self.write_interval = float(write_interval if write_interval is not None else os.getenv('WRITE_INTERVAL', '1'))
+        self.budgets = {}
+        self.blocked_until = 0
+        self._next_write = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def resource_for(url):
+        """
+        Guesses the rate limit resource a URL is charged to.
+        Args: url (str): Endpoint URL.
+        Returns: (str) Resource name as reported in X-RateLimit-Resource.
+        """
+        return 'graphql' if url.rstrip('/').endswith('/graphql') else 'core'
+
+    def acquire(self, method, url):
+        """
+        Blocks until a request may be sent without exceeding the rate limits.
+        Args:
+            method (str): HTTP method of the request.
+            url (str): Endpoint URL.
+        """
+        resource = self.resource_for(url)
+        with self._lock:
+            now = time.time()
+            wait = max(0, self.blocked_until - now)
+            budget = self.budgets.get(resource)
+            if budget and budget['reset'] > now:
+                if budget['remaining'] <= self.reserve:
+                    wait = max(wait, budget['reset'] - now)
+                else:
+                    budget['remaining'] -= 1
+            if method.upper() in self.WRITE_METHODS and resource != 'graphql':
+                start = max(now + wait, self._next_write)
+                self._next_write = start + self.write_interval
+                wait = start - now
+        if wait > 0:
+            logger.info(f"Waiting {wait:.1f}s for the {resource} rate limit.")
+            time.sleep(wait)
+
+    def update(self, response):
+        """
+        Records the rate limit headers of a response.
+        Args: response (requests.Response): Response from the GitHub API.
+        Returns: (float) Seconds to wait before retrying when the response was rate limited, otherwise None.
+        """
+        headers = response.headers
+        now = time.time()
+        with self._lock:
+            if 'X-RateLimit-Remaining' in headers:
+                resource = headers.get('X-RateLimit-Resource', self.resource_for(response.url))
+                reset = float(headers.get('X-RateLimit-Reset', now))
+                remaining = int(headers['X-RateLimit-Remaining'])
+                budget = self.budgets.get(resource)
+                if budget is None or reset != budget['reset'] or remaining < budget['remaining']:
+                    self.budgets[resource] = {
+                        'limit': int(headers.get('X-RateLimit-Limit', 0)),
+                        'remaining': remaining,
+                        'reset': reset,
+                    }
+            if response.status_code not in (403, 429):
+                return None
+            if 'Retry-After' in headers:
+                wait = float(headers['Retry-After'])
+            elif headers.get('X-RateLimit-Remaining') == '0':
+                wait = float(headers.get('X-RateLimit-Reset', now)) - now + 1
+            elif 'rate limit' in response.text.lower():
+                wait = self.SECONDARY_LIMIT_WAIT
+            else:
+                return None
+            wait = max(wait, 1)
+            self.blocked_until = max(self.blocked_until, now + wait)
+        logger.warning(f"Rate limited by GitHub on {response.url}, retrying in {wait:.0f}s.")
+        return wait
+
+    def headroom(self):
+        """
+        Returns the last known rate limit budget per resource.
+        Returns: (dict) Resource mapped to limit, remaining requests and reset time.
+        """
+        with self._lock:
+            return {resource: dict(budget) for resource, budget in self.budgets.items()}
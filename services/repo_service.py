@@ -7,6 +7,8 @@ import logging
 from dotenv import load_dotenv
 import os
 
+from services.github_client import GithubClient
+
 logger = logging.getLogger(__name__)
 load_dotenv()  # take environment variables from .env.
 branch_name = os.getenv('BRANCH')
@@ -14,110 +16,158 @@ branch_name = os.getenv('BRANCH')
 
 class RepoService:
 
-    def __init__(self, token, username):
+    def __init__(self, token, username, client=None):
         """
         Initialize the RepoService instance.
         Args:
             token (str): GitHub authentication token.
             username (str): GitHub username/owner of the repositories.
+            client (GithubClient, optional): Shared HTTP client. Defaults to the client shared for the token.
         """
         self.token = token
         self.owner = username
-        self.headers = {
-            'Accept': 'application/vnd.github+json',
-            'Authorization': f'Bearer {self.token}',
-            'X-GitHub-Api-Version': '2022-11-28',
-        }
+        self.client = client or GithubClient.shared(token)
+        self.api_url = self.client.api_url
 
-    def list_all_repos(self):
+    def iter_all_repos(self):
         """
-        Get a list of all repositories.
-        Returns: list: List of repositories.
+        Get all repositories, yielding them as their pages arrive.
+        The first page tells how many pages there are and the rest are fetched concurrently.
+        Returns: generator: Repositories in no particular order.
         """
         org_name = os.getenv('ORG')
-        repositories = []
-        page = 1
-        per_page = 100
         timeout_seconds = 15  # Set your desired timeout value here
-        if org_name != "":
-            url = f"https://api.github.com/orgs/{org_name}/repos"
-            while True:
-                params = {
-                    "page": page,
-                    "per_page": per_page
-                }
-                try:
-                    response = requests.get(url, headers=self.headers, params=params, timeout=timeout_seconds)
-                    response.raise_for_status()  # Raise an exception for non-2xx status codes
-
-                    data = response.json()
-                    repositories.extend(data)
-
-                    if len(data) < per_page:
-                        break  # Reached the last page
-
-                    page += 1
-
-                except requests.exceptions.RequestException as e:
-                    print("Failed to retrieve repositories:", str(e))
-                    break
-
-
+        if org_name:
+            url = f"{self.api_url}/orgs/{org_name}/repos"
         else:
-            url = f'https://api.github.com/users/{self.owner}/repos'
-            res = requests.get(url, headers=self.headers)
-            repositories.extend(res.json())
-        return repositories
+            url = f'{self.api_url}/users/{self.owner}/repos'
+        try:
+            yield from self.client.paginate(url, cache=True, timeout=timeout_seconds)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to retrieve repositories: {e}")
+            raise
+
+    def list_all_repos(self):
+        """
+        Get a list of all repositories.
+        Returns: list: List of repositories.
+        """
+        return list(self.iter_all_repos())
 
     def filter_repos(self, pattern):
         """
-        Filter repositories based on a given pattern.
+        Filter repositories based on a given pattern, yielding matches while the listing is still running.
         Args: pattern (str): Regular expression pattern to filter repositories.
-        Returns: List of filtered repositories.
+        Returns: generator: Filtered repositories.
         """
         p = re.compile(pattern)
-        all_repos = self.list_all_repos()
-        logger.info(f"Repo qty: {len(all_repos)}")
-        filtered_repos = [repo for repo in all_repos if p.match(repo['name'])]
-        return filtered_repos
+        total = 0
+        for repo in self.iter_all_repos():
+            total += 1
+            if p.match(repo['name']):
+                yield repo
+        logger.info(f"Repo qty: {total}")
 
 
-    def get_commit_sha(self, repo_name, branch="master"):
+    def get_commit_sha(self, repo_name, branch=None):
         """
         Get the commit SHA of a branch in a repository.
         Args:
             repo_name (str): Repository name.
-            branch (str, optional): Branch name. Defaults to "master".
+            branch (str, optional): Branch name. Defaults to the default branch of the repository.
         Returns: (str) Commit SHA of the branch.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo_name}/branches/{branch}'
-        response = requests.get(url, headers=self.headers)
+        head = self.get_head_commit(repo_name, branch)
+        return head[0] if head else None
+
+    def get_head_commit(self, repo_name, branch=None):
+        """
+        Get the head commit of a branch and the SHA of its tree.
+        Args:
+            repo_name (str): Repository name.
+            branch (str, optional): Branch name. Defaults to the default branch of the repository.
+        Returns: (tuple) Commit SHA and tree SHA, or None when the branch doesn't exist.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo_name}/commits/{branch or "HEAD"}'
+        response = self.client.get(url)
         if response.status_code == 200:
-            commit_sha = response.json().get("commit", {}).get("sha")
-            return commit_sha
+            commit = response.json()
+            return commit['sha'], commit['commit']['tree']['sha']
         return None
 
-
     def create_branch(self, repo_name, branch):
         """
         Create a branch in a repository.
         Args:
             repo_name (str): Repository name.
             branch (str): Branch name.
-        Returns: (dict) Response from the GitHub API.
+        Returns: (dict) Response from the GitHub API, or the created reference when its response was lost.
         """
         commit_sha = self.get_commit_sha(repo_name)
         if commit_sha:
-            url = f'https://api.github.com/repos/{self.owner}/{repo_name}/git/refs'
+            url = f'{self.api_url}/repos/{self.owner}/{repo_name}/git/refs'
             data = {
                 'ref': f'refs/heads/{branch}',
                 'sha': commit_sha
             }
-            response = requests.post(url, json=data, headers=self.headers)
-            return response.json()
+            response = self.client.retry_policy.write(
+                lambda: self.client.post(url, json=data),
+                lambda: self.get_commit_sha(repo_name, branch) == commit_sha)
+            return response.json() if response is not None else {'ref': data['ref'], 'object': {'sha': commit_sha}}
         else:
             return None
 
+    def provision_branch(self, repo_name, branch, path, content, base_sha=None, base_tree=None, base_branch=None):
+        """
+        Create or reset a branch pointing to a single commit that writes a file on top of a base commit,
+        using the Git Data API: one tree, one commit and one ref call.
+        Args:
+            repo_name (str): Repository name.
+            branch (str): Branch name.
+            path (str): Path of the file in the repository.
+            content (str): Content of the file.
+            base_sha (str, optional): Commit to build on. Defaults to the head of base_branch.
+            base_tree (str, optional): Tree of base_sha. Read together with base_sha when missing.
+            base_branch (str, optional): Branch whose head is used as base. Defaults to the default branch.
+        Returns: (str) SHA of the commit the branch points to.
+        """
+        if not base_sha or not base_tree:
+            head = self.get_head_commit(repo_name, base_branch)
+            if head is None:
+                raise ValueError(f"Couldn't find the head commit of {base_branch or 'the default branch'} in {repo_name}")
+            base_sha, base_tree = head
+        git_url = f'{self.api_url}/repos/{self.owner}/{repo_name}/git'
+        write = self.client.retry_policy.write
+        # Trees and commits are content addressed, a duplicate left by a retry is never referenced.
+        response = write(lambda: self.client.post(f'{git_url}/trees', json={
+            'base_tree': base_tree,
+            'tree': [{'path': path, 'mode': '100644', 'type': 'blob', 'content': content}],
+        }))
+        response.raise_for_status()
+        tree_sha = response.json()['sha']
+        response = write(lambda: self.client.post(f'{git_url}/commits', json={
+            'message': 'Updated workflow',
+            'tree': tree_sha,
+            'parents': [base_sha],
+        }))
+        response.raise_for_status()
+        commit_sha = response.json()['sha']
+
+        def branch_points_to_commit():
+            return self.get_commit_sha(repo_name, branch) == commit_sha
+
+        ref = {'ref': f'refs/heads/{branch}', 'sha': commit_sha}
+        response = write(lambda: self.client.post(f'{git_url}/refs', json=ref), branch_points_to_commit)
+        if response is not None and response.status_code == 422:
+            # The branch is left over from a previous scan, point it to the new commit.
+            response = write(lambda: self.client.patch(f'{git_url}/refs/heads/{branch}',
+                                                       json={'sha': commit_sha, 'force': True}),
+                             branch_points_to_commit)
+        if response is not None:
+            response.raise_for_status()
+        logger.info(f"Branch {branch} provisioned at {commit_sha} in {repo_name}.")
+        return commit_sha
+
     def update_workflow(self, repo, branch, path, path_to_local_workflow):
         """
         Update a workflow file in a repository.
@@ -127,13 +177,13 @@ class RepoService:
             path (str): Path to the workflow file.
             path_to_local_workflow (str): Path to the local workflow file..
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/contents/{path}'
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/contents/{path}'
         # commit_sha = self.get_commit_sha(repo, branch)
         try:
             with open(path_to_local_workflow, 'r') as file:
                 content = file.read()
                 # Retrieve the existing workflow file details
-                response = requests.get(url, headers=self.headers)
+                response = self.client.get(url)
                 workflow_data = response.json()
                 sha = workflow_data['sha']
                 data = {
@@ -143,7 +193,7 @@ class RepoService:
                     'sha': sha
                 }
                 print(branch)
-                response = requests.put(url, headers=self.headers, json=data)
+                response = self.client.put(url, json=data)
                 print(response)
                 if response.status_code == 200:
                     logger.info(f"File updated successfully at {branch} in {repo}.")
@@ -164,7 +214,7 @@ class RepoService:
         """
         # self.create_branch(repo_name)
         commit_sha = self.get_commit_sha(repo_name, branch)
-        url = f'https://api.github.com/repos/{self.owner}/{repo_name}/contents/.github/workflows/{workflow_name}?ref={branch}'
+        url = f'{self.api_url}/repos/{self.owner}/{repo_name}/contents/.github/workflows/{workflow_name}?ref={branch}'
         try:
             with open(path_to_workflow, 'r') as file:
                 content = file.read()
@@ -175,11 +225,11 @@ class RepoService:
                 'branch': branch,
                 'sha': commit_sha
             }
-            response = requests.put(url, json=data, headers=self.headers)
+            response = self.client.put(url, json=data)
             if response.status_code == 201:
                 print(f'Archivo de flujo de trabajo cargado en {repo_name} en la rama {branch}')
-        except:
-            print(f'Error al cargar el archivo de flujo de trabajo a {repo_name}. Status code: {response.status_code}')
+        except OSError as e:
+            print(f'Error al cargar el archivo de flujo de trabajo a {repo_name}: {e}')
 
         # if commit_sha:
         #
@@ -196,30 +246,78 @@ class RepoService:
         Args:
             repo_name (str): Repository name.
             branch (str): Branch name.
+        Returns: (bool) Whether the branch is gone.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo_name}/git/refs/heads/{branch}'
-        response = requests.delete(url, headers=self.headers)
+        url = f'{self.api_url}/repos/{self.owner}/{repo_name}/git/refs/heads/{branch}'
+        response = self.client.delete(url)
         if response.status_code == 204:
             logger.info(f"La rama '{branch}' ha sido eliminada del repositorio '{repo_name}'.")
-        else:
-            logger.error(f"Error al eliminar la rama '{branch}' del repositorio '{repo_name}'.")
+            return True
+        # 422 means the reference doesn't exist, e.g. a retried clean up already deleted it.
+        if response.status_code in (404, 422):
+            return True
+        logger.error(f"Error al eliminar la rama '{branch}' del repositorio '{repo_name}'.")
+        return False
 
-    def create_deployment_branch_policy(self, repo, environment_name):
+    def create_deployment_branch_policy(self, repo, environment_name, name=None):
         """
         Create a deployment branch policy for an environment.
         Args:
             repo (str): Repository name.
             environment_name (str): Name of the environment.
+            name (str, optional): Branch name pattern. Defaults to the pattern matching the BRANCH branch.
+        Returns: (dict) Created policy, or None when it couldn't be created.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/environments/{environment_name}/deployment-branch-policies'
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/environments/{environment_name}/deployment-branch-policies'
         data = {
-            "name": f"*{branch_name}*"
+            "name": name or f"*{branch_name}*"
         }
-        response = requests.post(url, headers=self.headers, json=data)
+        response = self.client.post(url, json=data)
         if response.status_code == 200:
             logger.info("Deployment branch policy created.")
-        else:
-            logger.error("Failed to create deployment branch policy. Status code:", response.status_code)
+            return response.json()
+        logger.error(f"Failed to create deployment branch policy. Status code: {response.status_code}")
+        return None
+
+    def delete_deployment_branch_policy(self, repo, environment_name, policy_id):
+        """
+        Delete a deployment branch policy of an environment.
+        Args:
+            repo (str): Repository name.
+            environment_name (str): Name of the environment.
+            policy_id (int): Policy ID.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/environments/{environment_name}/deployment-branch-policies/{policy_id}'
+        response = self.client.delete(url)
+        if response.status_code not in (204, 404):
+            response.raise_for_status()
+
+    def put_environment(self, repo, environment_name, config):
+        """
+        Create or replace the protection rules of an environment.
+        Args:
+            repo (str): Repository name.
+            environment_name (str): Name of the environment.
+            config (dict): wait_timer, prevent_self_review, reviewers, deployment_branch_policy and
+                can_admins_bypass.
+        Returns: (dict) Environment details.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/environments/{environment_name}'
+        response = self.client.put(url, json=config)
+        response.raise_for_status()
+        return response.json()
+
+    def delete_environment(self, repo, environment_name):
+        """
+        Delete an environment.
+        Args:
+            repo (str): Repository name.
+            environment_name (str): Name of the environment.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/environments/{environment_name}'
+        response = self.client.delete(url)
+        if response.status_code not in (204, 404):
+            response.raise_for_status()
 
     def update_environment(self, repo, environment_name, is_protected_branches=False):
         """
@@ -230,7 +328,7 @@ class RepoService:
             is_protected_branches (bool, optional): Flag indicating if the environment has protected branches.
             Defaults to False.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/environments/{environment_name}'
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/environments/{environment_name}'
         data = {
             "wait_timer": 0,
             # "reviewers": [],
@@ -239,13 +337,91 @@ class RepoService:
                 "custom_branch_policies": not is_protected_branches
             }
         }
-        response = requests.put(url, headers=self.headers, json=data)
+        response = self.client.put(url, json=data)
         if response.status_code == 200 and not is_protected_branches:
             self.create_deployment_branch_policy(repo, environment_name)
             logger.info(f"{environment_name} environment updated successfully.")
         elif response.status_code == 200:
             logger.info(f"{environment_name} environment updated successfully.")
         else:
-            logger.error("Failed to update environment. Status code:", response.status_code)
+            logger.error(f"Failed to update environment. Status code: {response.status_code}")
+            response.raise_for_status()
+
+    def get_file_sha(self, repo, path, ref):
+        """
+        Get the blob SHA of a file in a branch.
+        Args:
+            repo (str): Repository name.
+            path (str): Path of the file.
+            ref (str): Branch name.
+        Returns: (str) Blob SHA, or None when the file or the branch doesn't exist.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/contents/{path}'
+        response = self.client.get(url, cache=True, params={'ref': ref})
+        if response.status_code == 200:
+            return response.json()['sha']
+        return None
+
+    def get_environment(self, repo, environment_name):
+        """
+        Get the configuration of an environment.
+        Args:
+            repo (str): Repository name.
+            environment_name (str): Name of the environment.
+        Returns: (dict) Environment details, or None when it doesn't exist.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/environments/{environment_name}'
+        response = self.client.get(url, cache=True)
+        if response.status_code == 200:
+            return response.json()
+        return None
+
+    def list_deployment_branch_policies(self, repo, environment_name):
+        """
+        List the custom deployment branch policies of an environment.
+        Args:
+            repo (str): Repository name.
+            environment_name (str): Name of the environment.
+        Returns: (list) Branch policies, with their id, name and type.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/environments/{environment_name}/deployment-branch-policies'
+        try:
+            return list(self.client.paginate(url, key='branch_policies', cache=True))
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return []
+            raise
+
+    def list_secrets(self, repo, environment_name=None):
+        """
+        List the metadata (name, created_at, updated_at) of the secrets of a repository or of one of its
+        environments. Values are never returned by GitHub.
+        Args:
+            repo (str): Repository name.
+            environment_name (str, optional): Environment name. Defaults to the repository secrets.
+        Returns: (list) Secret metadata, empty when the environment doesn't exist.
+        """
+        if environment_name:
+            url = f'{self.api_url}/repos/{self.owner}/{repo}/environments/{environment_name}/secrets'
+        else:
+            url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/secrets'
+        try:
+            return list(self.client.paginate(url, key='secrets', cache=True))
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return []
             raise
 
+    def list_organization_secrets(self, repo):
+        """
+        List the metadata of the organization secrets shared with a repository.
+        Args: repo (str): Repository name.
+        Returns: (list) Secret metadata.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/organization-secrets'
+        try:
+            return list(self.client.paginate(url, key='secrets', cache=True))
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return []
+            raise
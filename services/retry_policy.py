@@ -0,0 +1,96 @@
+import logging
+import os
+import random
+import time
+
+import requests
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+# Requests that leave the same state behind however many times they are sent.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+RETRYABLE_STATUS = (500, 502, 503, 504)
+
+
+class RetryPolicy:
+    """
+    Decides when and how long to wait before sending a failed request again: idempotent requests are retried
+    with exponential backoff and full jitter, and writes are only sent again once verified not to have happened.
+    """
+
+    def __init__(self, retries=None, backoff=None, max_backoff=None, deadline=None, hedge_after=None):
+        """
+        Initializes the RetryPolicy.
+        Args:
+            retries (int, optional): Retries after a transient failure. Defaults to HTTP_RETRIES or 3.
+            backoff (float, optional): Base of the exponential backoff in seconds. Defaults to HTTP_BACKOFF or 0.5.
+            max_backoff (float, optional): Longest wait between two attempts. Defaults to HTTP_MAX_BACKOFF or 10.
+            deadline (float, optional): Seconds a call may take including its retries. Defaults to HTTP_DEADLINE or 120.
+            hedge_after (float, optional): Seconds after which a slow GET is sent a second time, the first answer
+                winning. Defaults to HTTP_HEDGE_AFTER or 0, which disables hedging.
+        """
+        self.retries = int(os.getenv('HTTP_RETRIES', '3') if retries is None else retries)
+        self.backoff = float(os.getenv('HTTP_BACKOFF', '0.5') if backoff is None else backoff)
+        self.max_backoff = float(os.getenv('HTTP_MAX_BACKOFF', '10') if max_backoff is None else max_backoff)
+        self.deadline = float(deadline or os.getenv('HTTP_DEADLINE', '120'))
+        self.hedge_after = float(os.getenv('HTTP_HEDGE_AFTER', '0') if hedge_after is None else hedge_after)
+
+    def delay(self, attempt):
+        """
+        Returns a random wait before the next attempt, up to an exponentially growing bound.
+        Args: attempt (int): Attempts failed so far, starting at 0.
+        Returns: (float) Seconds to wait.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def is_idempotent(method):
+        """
+        Tells whether a request can be sent again blindly.
+        Args: method (str): HTTP method.
+        Returns: (bool) Whether the method is idempotent.
+        """
+        return method.upper() in IDEMPOTENT_METHODS
+
+    @staticmethod
+    def is_retryable(response):
+        """
+        Tells whether a response is a transient server failure.
+        Args: response (requests.Response): Response to check.
+        Returns: (bool) Whether the request may succeed if sent again.
+        """
+        return response.status_code in RETRYABLE_STATUS
+
+    def write(self, send, verify=None, deadline=None):
+        """
+        Sends a non-idempotent write. When its response is lost or a transient failure, verify tells whether the
+        write happened anyway, and it is only sent again when it didn't.
+        Args:
+            send (callable): Sends the write and returns the response.
+            verify (callable, optional): Returns whether the write took effect. Defaults to sending again
+                blindly, for writes whose duplicates are harmless.
+            deadline (float, optional): Seconds the write may take including its retries. Defaults to the policy
+                deadline.
+        Returns: (requests.Response) Response of the write, or None when verify confirmed a lost write.
+        """
+        end = time.monotonic() + (deadline or self.deadline)
+        for attempt in range(self.retries + 1):
+            error = None
+            try:
+                response = send()
+                if not self.is_retryable(response):
+                    return response
+            except requests.exceptions.RequestException as e:
+                error, response = e, None
+            if verify is not None and verify():
+                logger.info("The write went through despite the failed response.")
+                return None
+            delay = self.delay(attempt)
+            if attempt == self.retries or time.monotonic() + delay > end:
+                if error is not None:
+                    raise error
+                return response
+            logger.warning(f"Write failed with {error or response.status_code}, retrying in {delay:.1f}s.")
+            time.sleep(delay)
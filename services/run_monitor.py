@@ -0,0 +1,139 @@
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from services.github_client import GithubClient
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+RUNS_QUERY = """
+query($ids: [ID!]!) {
+  nodes(ids: $ids) {
+    ... on WorkflowRun {
+      id
+      databaseId
+      checkSuite { status conclusion }
+    }
+  }
+}
+"""
+
+
+class RunMonitor:
+    """
+    Refreshes every in-flight workflow run from one background loop, a single GraphQL query per batch of runs
+    and tick, and wakes up the pipelines waiting for them.
+    """
+
+    def __init__(self, token, client=None, interval=None, batch_size=100):
+        """
+        Initializes the RunMonitor.
+        Args:
+            token (str): GitHub authentication token.
+            client (GithubClient, optional): Shared HTTP client. Defaults to the client shared for the token.
+            interval (float, optional): Seconds between refreshes. Defaults to RUN_MONITOR_INTERVAL or 5.
+            batch_size (int, optional): Runs per GraphQL query. Defaults to 100, the nodes() maximum.
+        """
+        self.client = client or GithubClient.shared(token)
+        self.interval = float(interval or os.getenv('RUN_MONITOR_INTERVAL', '5'))
+        self.batch_size = batch_size
+        self.deadline = float(os.getenv('RUN_DEADLINE', '900'))
+        self.runs = {}
+        # Node ids of the runs that entered 'waiting' since their pipeline last looked.
+        self.entered_waiting = set()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def watch(self, run):
+        """
+        Starts refreshing a run.
+        Args: run (Run): Run with its GraphQL node id.
+        """
+        with self._condition:
+            self.runs[run.node_id] = run
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='run-monitor', daemon=True)
+                self._thread.start()
+
+    def unwatch(self, run):
+        """
+        Stops refreshing a run.
+        Args: run (Run): Run previously watched.
+        """
+        with self._condition:
+            self.runs.pop(run.node_id, None)
+            self.entered_waiting.discard(run.node_id)
+
+    def wait(self, run, statuses=('waiting', 'completed'), deadline=None, on_waiting=None):
+        """
+        Blocks until the monitor sees the run in one of the given statuses.
+        Args:
+            run (Run): Run to wait for.
+            statuses (tuple, optional): Statuses to stop at. Defaults to ('waiting', 'completed').
+            deadline (float, optional): Seconds to wait. Defaults to RUN_DEADLINE or 900.
+            on_waiting (callable, optional): Called with the run every time it enters 'waiting', e.g. to approve
+                its pending deployments. It runs on the calling thread, so that the monitor loop never waits for
+                its writes, and an exception it raises is raised here.
+        Returns: (Run) Run in one of the requested statuses.
+        """
+        end = time.monotonic() + (deadline or self.deadline)
+        if on_waiting is not None and run.status == 'waiting':
+            on_waiting(run)
+        self.watch(run)
+        try:
+            while True:
+                with self._condition:
+                    tracked = self.runs[run.node_id]
+                    reached = self._condition.wait_for(
+                        lambda: tracked.status in statuses
+                        or (on_waiting is not None and tracked.node_id in self.entered_waiting),
+                        max(end - time.monotonic(), 0))
+                    entered_waiting = tracked.node_id in self.entered_waiting
+                    self.entered_waiting.discard(tracked.node_id)
+                if not reached:
+                    raise TimeoutError(f"Run {tracked.id} is still {tracked.status}.")
+                if tracked.status in statuses:
+                    return tracked
+                if entered_waiting:
+                    on_waiting(tracked)
+        finally:
+            self.unwatch(run)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                node_ids = list(self.runs)
+                if not node_ids:
+                    self._thread = None
+                    return
+            started = time.monotonic()
+            try:
+                self.refresh(node_ids)
+            except Exception:
+                logger.exception("Failed to refresh workflow runs.")
+            time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+    def refresh(self, node_ids):
+        """
+        Reads the status of the given runs, flags the ones that just entered 'waiting' and notifies the waiting
+        pipelines.
+        Args: node_ids (list): GraphQL node ids of the runs.
+        """
+        for start in range(0, len(node_ids), self.batch_size):
+            data = self.client.graphql(RUNS_QUERY, {'ids': node_ids[start:start + self.batch_size]})
+            with self._condition:
+                for node in data.get('nodes') or []:
+                    if not node or node['id'] not in self.runs:
+                        continue
+                    suite = node.get('checkSuite') or {}
+                    run = self.runs[node['id']]
+                    previous = run.status
+                    run.status = (suite.get('status') or run.status).lower()
+                    run.conclusion = (suite.get('conclusion') or '').lower() or None
+                    if run.status == 'waiting' and previous != 'waiting':
+                        self.entered_waiting.add(run.node_id)
+                self._condition.notify_all()
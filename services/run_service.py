@@ -1,32 +1,35 @@
-import re
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
 import zipfile
 import logging
 from datetime import datetime
 
+from services.github_client import GithubClient
+
 logger = logging.getLogger(__name__)
 
+RESULTS_ARTIFACT_PREFIX = 'secret-results-'
+
 
 class RunService:
     """
     A class that provides methods to interact with GitHub workflow runs.
     """
 
-    def __init__(self, token, owner):
+    def __init__(self, token, owner, client=None):
         """
         Initializes the RunService.
         Args:
             token (str): GitHub authentication token.
             owner (str): Repository owner username.
+            client (GithubClient, optional): Shared HTTP client. Defaults to the client shared for the token.
         """
         self.token = token
         self.owner = owner
-        self.headers = {
-            'Accept': 'application/vnd.github+json',
-            'Authorization': f'Bearer {self.token}',
-            'X-GitHub-Api-Version': '2022-11-28',
-        }
+        self.client = client or GithubClient.shared(token)
+        self.api_url = self.client.api_url
 
     def get_run_status(self, repo, workflow_id):
         """
@@ -38,43 +41,106 @@ class RunService:
             dict: Run status details.
         """
         current_date = datetime.now().strftime("%Y-%m-%d")
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/actions/workflows/{workflow_id}/runs?created={current_date}&per_page=1'
-        response = requests.get(url, headers=self.headers)
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/workflows/{workflow_id}/runs?created={current_date}&per_page=1'
+        response = self.client.get(url)
         return response.json()
 
-    def get_logs(self, repo, run_id):
+    def list_runs(self, repo, workflow_id, branch=None, event=None, created=None):
         """
-        Retrieves the logs of a specific workflow run in a repository.
+        Lists the runs of a workflow filtered by branch, triggering event and creation date.
+        Args:
+            repo (str): Repository name.
+            workflow_id (str): Workflow ID or file name.
+            branch (str, optional): Branch the runs were started on.
+            event (str, optional): Event that triggered the runs, e.g. 'workflow_dispatch'.
+            created (str, optional): Creation date filter, e.g. '>=2023-06-01T10:00:00Z'.
+        Returns: (list) Workflow runs, newest first.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/workflows/{workflow_id}/runs'
+        params = {key: value for key, value in {'branch': branch, 'event': event, 'created': created}.items() if value}
+        response = self.client.get(url, params=params)
+        response.raise_for_status()
+        return response.json()['workflow_runs']
+
+    def get_run(self, repo, run_id):
+        """
+        Retrieves a specific workflow run.
         Args:
             repo (str): Repository name.
             run_id (str): Run ID.
-        Returns: dict Logs details.
-        """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/actions/runs/{run_id}/attempts/1/logs'
-        response = requests.get(url, headers=self.headers, stream=True)
-        file_name = '../logs.zip'
-        chunk_size = 128
-        p = re.compile('Is present in AWS.*')
-        result = {}
-        with open(file_name, 'wb') as file:
-            for chunk in response.iter_content(chunk_size=chunk_size):
-                file.write(chunk)
-        # files_to_extract = ['1_get-qa-secrets.txt', '1_get-st-secrets.txt', '1_get-pr-secrets.txt']
-        files_to_extract = {
-            'qa': '1_get-qa-secrets.txt',
-            'st': '1_get-st-secrets.txt',
-            'pr': '1_get-pr-secrets.txt'
-        }
-        with zipfile.ZipFile(file_name, 'r') as zip:
-            zip.extract('1_get-qa-secrets.txt', '')
-            zip.extract('1_get-st-secrets.txt', '')
-            zip.extract('1_get-pr-secrets.txt', '')
-        for env in list(dict.fromkeys(files_to_extract)):
-            with open(files_to_extract[env], 'r') as file:
-                out = file.read()
-                result[env] = p.findall(out)
+        Returns: (dict) Run details.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/runs/{run_id}'
+        response = self.client.get(url)
+        response.raise_for_status()
+        return response.json()
+
+    def get_result_payloads(self, repo, run_id):
+        """
+        Retrieves the JSON results uploaded as artifacts by the secret check jobs of a workflow run.
+        Args:
+            repo (str): Repository name.
+            run_id (str): Run ID.
+        Returns: (list) One decoded payload per environment.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/runs/{run_id}/artifacts'
+        artifacts = [artifact for artifact in self.client.paginate(url, key='artifacts')
+                     if artifact['name'].startswith(RESULTS_ARTIFACT_PREFIX) and not artifact.get('expired')]
+        with ThreadPoolExecutor(max_workers=max(len(artifacts), 1)) as executor:
+            return list(executor.map(self.download_artifact_json, [a['archive_download_url'] for a in artifacts]))
+
+    @staticmethod
+    def results_by_key(payloads, access_key_ids):
+        """
+        Regroups the result payloads of a run by access key.
+        Args:
+            payloads (list): Payloads returned by get_result_payloads.
+            access_key_ids (list): Access key IDs the run was dispatched with, in the same order.
+        Returns: dict Access key mapped to environment, mapped to secret name and whether it matches the key.
+        """
+        result = {key: {} for key in access_key_ids}
+        for payload in payloads:
+            for index, key in enumerate(access_key_ids):
+                result[key][payload['environment']] = {
+                    secret: flags[index] for secret, flags in payload['secrets'].items()
+                }
         return result
 
+    def get_results(self, repo, run_id, access_key_ids):
+        """
+        Retrieves the results of a workflow run grouped by access key.
+        Args:
+            repo (str): Repository name.
+            run_id (str): Run ID.
+            access_key_ids (list): Access key IDs the run was dispatched with, in the same order.
+        Returns: dict Access key mapped to environment, mapped to secret name and whether it matches the key.
+        """
+        return self.results_by_key(self.get_result_payloads(repo, run_id), access_key_ids)
+
+    def download_artifact_json(self, url):
+        """
+        Downloads an artifact and decodes the JSON file it contains.
+        Args: url (str): Archive download URL of the artifact.
+        Returns: (dict) Decoded JSON payload.
+        """
+        response = self.client.get(url)
+        response.raise_for_status()
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            name = next(name for name in archive.namelist() if name.endswith('.json'))
+            with archive.open(name) as member:
+                return json.load(member)
+
+    def cancel_run(self, repo, run_id):
+        """
+        Cancels a workflow run that is still queued, waiting or in progress.
+        Args:
+            repo (str): Repository name.
+            run_id (str): Run ID.
+        """
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/runs/{run_id}/cancel'
+        response = self.client.post(url)
+        if response.status_code not in (202, 409):
+            logger.error(f"Failed to cancel run {run_id}. Status code: {response.status_code}")
 
     def delete_logs(self, repo, run_id):
         """
@@ -82,14 +148,29 @@ class RunService:
         Args:
             repo (str): Repository name.
             run_id (str): Run ID.
+        Returns: (bool) Whether the run is gone.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/actions/runs/{run_id}'
-        response = requests.delete(url, headers=self.headers)
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/runs/{run_id}'
+        response = self.client.delete(url)
 
-        if response.status_code == 204:
+        if response.status_code in (204, 404):
             print(f'Logs eliminados para el run {run_id}')
-        else:
-            print(f'fallo eliminacion de logs para el run {run_id}. Status code: {response.status_code}')
+            return True
+        print(f'fallo eliminacion de logs para el run {run_id}. Status code: {response.status_code}')
+        return False
+
+    def list_pending_deployments(self, repo, run_id):
+        """
+        Lists the deployments of a workflow run waiting for approval.
+        Args:
+            repo (str): Repository name.
+            run_id (str): Run ID.
+        Returns: (list) Pending deployments, each with its environment id and name.
+        """
+        url = f"{self.api_url}/repos/{self.owner}/{repo}/actions/runs/{run_id}/pending_deployments"
+        response = self.client.get(url)
+        response.raise_for_status()
+        return response.json()
 
     def approve_pending_deployments(self, repo, run_id, environments):
         """
@@ -100,13 +181,13 @@ class RunService:
             environments (list): List of environment IDs.
         Returns: (dict) Response from the GitHub API.
         """
-        url = f"https://api.github.com/repos/{self.owner}/{repo}/actions/runs/{run_id}/pending_deployments"
+        url = f"{self.api_url}/repos/{self.owner}/{repo}/actions/runs/{run_id}/pending_deployments"
         data = {
             "environment_ids": environments,
             "state": "approved",
             "comment": "Deployments approved..."
         }
-        response = requests.post(url, headers=self.headers, json=data)
+        response = self.client.post(url, json=data)
         return response
 
     def list_environments(self, repo):
@@ -115,6 +196,6 @@ class RunService:
         Args: repo (str): Repository name.
         Returns: (dict) Environment details.
         """
-        url = f"https://api.github.com/repos/{self.owner}/{repo}/environments"
-        response = requests.get(url, headers=self.headers)
+        url = f"{self.api_url}/repos/{self.owner}/{repo}/environments"
+        response = self.client.get(url, cache=True)
         return response.json()
@@ -0,0 +1,85 @@
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from entities.run import Run
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+
+class RunTracker:
+    """
+    Finds the run started by a workflow dispatch with adaptive polling. Waiting for the run is left to RunMonitor.
+    """
+
+    # GitHub stamps created_at with its own clock, so accept runs created slightly before the dispatch.
+    CLOCK_SKEW = timedelta(seconds=5)
+
+    def __init__(self, run_service, initial_interval=None, max_interval=None, deadline=None):
+        """
+        Initializes the RunTracker.
+        Args:
+            run_service (RunService): Service used to read the runs.
+            initial_interval (float, optional): First polling interval in seconds. Defaults to RUN_POLL_INTERVAL or 2.
+            max_interval (float, optional): Longest polling interval in seconds. Defaults to RUN_POLL_MAX_INTERVAL or 30.
+            deadline (float, optional): Seconds to wait for a run overall. Defaults to RUN_DEADLINE or 900.
+        """
+        self.run_service = run_service
+        self.initial_interval = float(initial_interval or os.getenv('RUN_POLL_INTERVAL', '2'))
+        self.max_interval = float(max_interval or os.getenv('RUN_POLL_MAX_INTERVAL', '30'))
+        self.deadline = float(deadline or os.getenv('RUN_DEADLINE', '900'))
+
+    @staticmethod
+    def now():
+        """
+        Returns the current UTC time, to be taken right before dispatching a workflow.
+        Returns: (datetime) Current time.
+        """
+        return datetime.now(timezone.utc)
+
+    @staticmethod
+    def to_run(res):
+        """
+        Converts a run from the GitHub API into a Run.
+        Args: res (dict): Workflow run.
+        Returns: (Run) Run object.
+        """
+        return Run(res['id'], res['status'], res.get('conclusion'), res.get('created_at'), res.get('node_id'))
+
+    def intervals(self, deadline):
+        """
+        Yields polling intervals that start at the initial interval and grow up to the maximum,
+        stopping once the deadline has passed.
+        Args: deadline (float): Seconds to keep polling.
+        Returns: generator: Seconds to sleep before each poll.
+        """
+        end = time.monotonic() + deadline
+        interval = self.initial_interval
+        while time.monotonic() < end:
+            yield min(interval, max(end - time.monotonic(), 0))
+            interval = min(interval * 1.5, self.max_interval)
+
+    def find_run(self, repo, workflow_id, branch, dispatched_at, deadline=None):
+        """
+        Waits for the run created by a dispatch to show up.
+        Args:
+            repo (str): Repository name.
+            workflow_id (str): Workflow ID or file name.
+            branch (str): Branch the workflow was dispatched on.
+            dispatched_at (datetime): Time taken right before the dispatch.
+            deadline (float, optional): Seconds to wait. Defaults to the tracker deadline.
+        Returns: (Run) The dispatched run.
+        """
+        since = dispatched_at - self.CLOCK_SKEW
+        created = f">={since.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+        for interval in self.intervals(deadline or self.deadline):
+            runs = self.run_service.list_runs(repo, workflow_id, branch, 'workflow_dispatch', created)
+            if runs:
+                # The oldest run created after the dispatch is ours; later ones belong to newer dispatches.
+                return self.to_run(min(runs, key=lambda res: res['created_at']))
+            time.sleep(interval)
+        raise TimeoutError(f"No run of {workflow_id} was dispatched on {branch} in {repo}.")
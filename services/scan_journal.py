@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+# Stages a repository goes through. Clean up runs in the background, so 'cleaned' may come after 'done'.
+# 'branch_created' and 'environment_prepared' are recorded while provisioning, so that a provisioning that
+# stops half way can be cleaned up. 'abandoned' is not a stage: it makes the journal forget the repo.
+STAGES = ['branch_created', 'environment_prepared', 'provisioned', 'dispatched', 'run', 'approved', 'results',
+          'cleaned', 'done']
+ABANDONED = 'abandoned'
+
+
+class ScanJournal:
+    """
+    An append-only JSON lines journal of the stage transitions of every repository in a scan, written as they
+    happen so that a scan that dies can resume where it stopped.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initializes the ScanJournal, replaying it from disk when it exists.
+        Args: path (str, optional): Journal file. Defaults to SCAN_JOURNAL or .cache/scan-journal.jsonl.
+        """
+        self.path = path or os.getenv('SCAN_JOURNAL', '.cache/scan-journal.jsonl')
+        self.scan_key = None
+        self.repos = {}
+        self._lock = threading.Lock()
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                for line in file:
+                    try:
+                        self._apply(json.loads(line))
+                    except ValueError:
+                        # A crash in the middle of a write leaves a truncated last line.
+                        logger.warning(f"Ignoring a corrupt line of {self.path}.")
+
+    def _apply(self, entry):
+        if 'scan' in entry:
+            self.scan_key = entry['scan']
+            self.repos = {}
+        elif entry['stage'] == ABANDONED:
+            self.repos.pop(entry['repo'], None)
+        else:
+            data = {key: value for key, value in entry.items() if key not in ('repo', 'at')}
+            state = self.repos.get(entry['repo'], {'stages': []})
+            self.repos[entry['repo']] = {**state, **data, 'stages': state['stages'] + [entry['stage']]}
+
+    def _append(self, entry):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        self._apply(entry)
+
+    def reset(self, scan_key):
+        """
+        Starts the journal of a new scan, forgetting every repository of the previous one.
+        Args: scan_key (str): Identifies the scan inputs, so that only the same scan is resumed.
+        """
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._append({'scan': scan_key, 'at': time.time()})
+
+    def record(self, repo, stage, **data):
+        """
+        Appends a stage transition of a repository.
+        Args:
+            repo (str): Repository name.
+            stage (str): One of STAGES, or 'abandoned' to forget the repository.
+            **data: JSON serializable details of the stage, e.g. the run id.
+        Returns: (dict) Everything recorded for the repository so far.
+        """
+        with self._lock:
+            self._append({'repo': repo, 'stage': stage, 'at': time.time(), **data})
+            return dict(self.repos.get(repo, {}))
+
+    def state(self, repo):
+        """
+        Returns everything recorded for a repository.
+        Args: repo (str): Repository name.
+        Returns: (dict) Details of every stage, with the last stage under 'stage' and all of them under 'stages',
+            or None.
+        """
+        with self._lock:
+            state = self.repos.get(repo)
+            return dict(state) if state else None
+
+    def unfinished(self):
+        """
+        Returns the repositories without results or with a scan branch that wasn't cleaned up.
+        Returns: (dict) Repository name mapped to its state.
+        """
+        with self._lock:
+            return {repo: dict(state) for repo, state in self.repos.items()
+                    if 'done' not in state['stages']
+                    or ({'branch_created', 'provisioned'} & set(state['stages'])
+                        and 'cleaned' not in state['stages'])}
+
+    def remove(self):
+        """
+        Deletes the journal once the scan is over.
+        """
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.scan_key = None
+            self.repos = {}
+
+    @staticmethod
+    def reached(state, stage):
+        """
+        Tells whether a repository already went through a stage.
+        Args:
+            state (dict): State of the repository, or None.
+            stage (str): One of STAGES.
+        Returns: (bool) Whether the stage was recorded.
+        """
+        return bool(state) and stage in state['stages']
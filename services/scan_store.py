@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger(__name__)
+load_dotenv()  # take environment variables from .env.
+
+
+class ScanStore:
+    """
+    A SQLite store of the secret metadata and scan results of every repository, used to skip workflow runs
+    for repositories whose secrets didn't change since their last scan.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initializes the ScanStore.
+        Args: path (str, optional): SQLite database file. Defaults to SCAN_STORE or .cache/scans.db.
+        """
+        self.path = path or os.getenv('SCAN_STORE', '.cache/scans.db')
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS secret_metadata ('
+                'repo TEXT, scope TEXT, name TEXT, updated_at TEXT, PRIMARY KEY (repo, scope, name))'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'repo TEXT, access_key TEXT, metadata_hash TEXT, result TEXT, scanned_at REAL, '
+                'PRIMARY KEY (repo, access_key))'
+            )
+            # Results were once stored under the plain access key, they are dropped and scanned again.
+            self.connection.execute('DELETE FROM results WHERE length(access_key) != 64')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS warm_branches ('
+                'repo TEXT PRIMARY KEY, branch TEXT, workflow_path TEXT, blob_sha TEXT, environments TEXT, provisioned_at REAL)'
+            )
+
+    @staticmethod
+    def metadata_hash(metadata, secret_pattern):
+        """
+        Digests the secret metadata of a repository together with the pattern used to filter it.
+        Args:
+            metadata (dict): Scope ('repo', 'org' or an environment) mapped to secret name mapped to updated_at.
+            secret_pattern (str): Pattern the workflow filters the secrets with.
+        Returns: (str) Hex digest that changes when a relevant secret is added, removed or updated.
+        """
+        payload = json.dumps({'pattern': secret_pattern, 'metadata': metadata}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def key_digest(access_key):
+        """
+        Digests an access key, results are stored under the digest so that the keys never reach the disk.
+        Args: access_key (str): Access key ID.
+        Returns: (str) Hex digest of the key.
+        """
+        return hashlib.sha256(access_key.encode('utf-8')).hexdigest()
+
+    def save_metadata(self, repo, metadata):
+        """
+        Replaces the stored secret metadata of a repository.
+        Args:
+            repo (str): Repository name.
+            metadata (dict): Scope mapped to secret name mapped to updated_at.
+        """
+        rows = [(repo, scope, name, updated_at) for scope, secrets in metadata.items()
+                for name, updated_at in secrets.items()]
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM secret_metadata WHERE repo = ?', (repo,))
+            self.connection.executemany('INSERT INTO secret_metadata VALUES (?, ?, ?, ?)', rows)
+
+    def get_results(self, repo, access_key_ids, metadata_hash):
+        """
+        Returns the stored results that are still valid for the current metadata of a repository.
+        Args:
+            repo (str): Repository name.
+            access_key_ids (list): Access key IDs to look for.
+            metadata_hash (str): Digest of the current secret metadata.
+        Returns: (dict) Access key mapped to its stored result, only for keys with a valid result.
+        """
+        keys = {self.key_digest(access_key): access_key for access_key in access_key_ids}
+        marks = ', '.join('?' for _ in keys)
+        with self._lock:
+            rows = self.connection.execute(
+                f'SELECT access_key, result FROM results WHERE repo = ? AND metadata_hash = ? AND access_key IN ({marks})',
+                (repo, metadata_hash, *keys),
+            ).fetchall()
+        return {keys[digest]: json.loads(result) for digest, result in rows}
+
+    def save_results(self, repo, results, metadata_hash):
+        """
+        Stores the results of a scan.
+        Args:
+            repo (str): Repository name.
+            results (dict): Access key mapped to its result.
+            metadata_hash (str): Digest of the secret metadata the scan ran with.
+        """
+        now = time.time()
+        rows = [(repo, self.key_digest(access_key), metadata_hash, json.dumps(result), now)
+                for access_key, result in results.items()]
+        with self._lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)', rows)
+
+    def get_warm_branch(self, repo):
+        """
+        Returns the scan branch kept provisioned in a repository.
+        Args: repo (str): Repository name.
+        Returns: (dict) Branch, workflow path, template blob SHA and environment states, or None.
+        """
+        return self.list_warm_branches(repo).get(repo)
+
+    def list_warm_branches(self, repo=None):
+        """
+        Returns the scan branches kept provisioned.
+        Args: repo (str, optional): Only return the branch of this repository.
+        Returns: (dict) Repository name mapped to branch, workflow path, template blob SHA and environment states.
+        """
+        query = 'SELECT repo, branch, workflow_path, blob_sha, environments FROM warm_branches'
+        with self._lock:
+            if repo is None:
+                rows = self.connection.execute(query).fetchall()
+            else:
+                rows = self.connection.execute(f'{query} WHERE repo = ?', (repo,)).fetchall()
+        return {name: {'branch': branch, 'workflow_path': path, 'blob_sha': blob_sha,
+                       'environments': json.loads(environments or '{}')}
+                for name, branch, path, blob_sha, environments in rows}
+
+    def save_warm_branch(self, repo, branch, workflow_path, blob_sha, environments=None):
+        """
+        Records a scan branch kept provisioned between scans.
+        Args:
+            repo (str): Repository name.
+            branch (str): Branch name.
+            workflow_path (str): Path of the workflow file replaced by the template.
+            blob_sha (str): Blob SHA of the template written to the branch.
+            environments (dict, optional): Environment states to restore on teardown.
+        """
+        with self._lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO warm_branches VALUES (?, ?, ?, ?, ?, ?)',
+                                    (repo, branch, workflow_path, blob_sha, json.dumps(environments or {}),
+                                     time.time()))
+
+    def delete_warm_branch(self, repo):
+        """
+        Forgets the scan branch of a repository once it has been torn down.
+        Args: repo (str): Repository name.
+        """
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM warm_branches WHERE repo = ?', (repo,))
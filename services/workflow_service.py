@@ -1,8 +1,9 @@
-import requests
 import re
 import logging
 from datetime import datetime, timedelta
 
+from services.github_client import GithubClient
+
 logger = logging.getLogger(__name__)
 
 class WorkflowService:
@@ -10,20 +11,18 @@ class WorkflowService:
     A class that provides methods to interact with GitHub workflows.
     """
 
-    def __init__(self, token, owner):
+    def __init__(self, token, owner, client=None):
         """
         Initializes the WorkflowService.
         Args:
             token (str): GitHub authentication token.
             owner (str): Repository owner username.
+            client (GithubClient, optional): Shared HTTP client. Defaults to the client shared for the token.
         """
         self.token = token
         self.owner = owner
-        self.headers = {
-            'Accept': 'application/vnd.github+json',
-            'Authorization': f'Bearer {self.token}',
-            'X-GitHub-Api-Version': '2022-11-28',
-        }
+        self.client = client or GithubClient.shared(token)
+        self.api_url = self.client.api_url
 
     def get_workflows(self, repo, pattern):
         """
@@ -33,9 +32,9 @@ class WorkflowService:
             pattern (str): Regular expression pattern to match workflow names.
         Returns: List of matching workflows.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/actions/workflows'
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/workflows'
         p = re.compile(pattern)
-        response = requests.get(url, headers=self.headers)
+        response = self.client.get(url, cache=True)
         workflows = response.json()['workflows']
         [print(workflow['name']) for workflow in workflows]
         return [workflow for workflow in workflows if p.match(workflow['name'])]
@@ -48,8 +47,8 @@ class WorkflowService:
             workflow_id (str): Workflow ID.
         Returns: (dict) Workflow details.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/actions/workflows/{workflow_id}'
-        response = requests.get(url, headers=self.headers)
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/workflows/{workflow_id}'
+        response = self.client.get(url, cache=True)
         return response.json()
 
     def get_any_workflow(self, repo):
@@ -58,37 +57,46 @@ class WorkflowService:
         Args: repo (str): Repository name.
         Returns: (dict) Workflow details.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/actions/workflows'
-        response = requests.get(url, headers=self.headers)
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/workflows'
+        response = self.client.get(url, cache=True)
         workflows = response.json()['workflows']
         try:
             return workflows[0]
-        except:
-            logger.error(
-                "Couldn't find any workflow in ", repo
-            )
+        except IndexError:
+            logger.error(f"Couldn't find any workflow in {repo}")
             raise
 
-    def dispatch_workflow(self, repo, workflow_id, access_key_id, branch, secret_pattern):
+    def dispatch_workflow(self, repo, workflow_id, access_key_ids, branch, secret_pattern, fingerprint_salt=None,
+                          verify=None):
         """
-        Dispatches a workflow in a repository with specified inputs.
+        Dispatches a workflow in a repository with specified inputs. A dispatch whose response is lost or a
+        transient failure is only sent again when verify says that no run was started.
         Args:
             repo (str): Repository name.
             workflow_id (str): Workflow ID.
-            access_key_id (str): Access key ID.
+            access_key_ids (list): Access key IDs checked in the same run. A single str is also accepted.
             branch (str): Branch name.
             secret_pattern (str): Secret pattern.
-        Returns: Response from the GitHub API.
+            fingerprint_salt (str, optional): Salt of the HMAC fingerprints the run should also report.
+            verify (callable, optional): Returns whether the dispatch started a run. Defaults to never sending
+                the dispatch again.
+        Returns: Response from the GitHub API, or None when verify found the run of a lost dispatch.
         """
-        url = f'https://api.github.com/repos/{self.owner}/{repo}/actions/workflows/{workflow_id}/dispatches'
+        if isinstance(access_key_ids, str):
+            access_key_ids = [access_key_ids]
+        url = f'{self.api_url}/repos/{self.owner}/{repo}/actions/workflows/{workflow_id}/dispatches'
         data = {
             'ref': branch,
             'inputs': {
-                'access_key_id': access_key_id,
+                'access_key_ids': ','.join(access_key_ids),
                 'filter_secret_pattern': secret_pattern
             }
         }
-        return requests.post(url, json=data, headers=self.headers)
+        if fingerprint_salt:
+            data['inputs']['fingerprint_salt'] = fingerprint_salt
+        if verify is None:
+            return self.client.post(url, json=data)
+        return self.client.retry_policy.write(lambda: self.client.post(url, json=data), verify)
 
     # def get_workflow_status(self, repo):
     #     current_date = datetime.now().strftime("%Y-%m-%d")
@@ -0,0 +1,139 @@
+import importlib
+import os
+import sys
+from unittest import mock
+
+import pytest
+import requests
+
+from benchmark import scan_settings
+from entities.repo import Repo
+from fake_github import LEAKED_KEY, FakeGithub, HttpError
+from services.scan_journal import ScanJournal
+
+FAST_SCAN = {'GITHUB_TOKEN': 'app-test-token', 'WRITE_INTERVAL': '0', 'RUN_POLL_INTERVAL': '0.1',
+             'RUN_MONITOR_INTERVAL': '0.1', 'CLEANUP_BACKOFF': '0.1'}
+RUN_DELETES = 'DELETE /repos/{owner}/{repo}/actions/runs/{run_id}'
+
+
+@pytest.fixture(scope='module')
+def github():
+    with FakeGithub(repos=8, queue_delay=0.1, run_delay=0.1) as github:
+        yield github
+
+
+@pytest.fixture(scope='module')
+def app(github, tmp_path_factory):
+    # app reads its settings and builds its services on import.
+    settings = {**scan_settings(github, str(tmp_path_factory.mktemp('scan'))), **FAST_SCAN}
+    with mock.patch.dict(os.environ, settings):
+        yield importlib.reload(sys.modules['app']) if 'app' in sys.modules else importlib.import_module('app')
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = ScanJournal(str(tmp_path / 'journal.jsonl'))
+    journal.reset('scan')
+    yield journal
+
+
+def scan(app, journal, name):
+    return app.run_scan(Repo(0, name, 'main'), [LEAKED_KEY], journal=journal)
+
+
+def test_clean_up_retries_only_the_failed_steps(app, github, journal, monkeypatch):
+    delete_branch = app.repo_serv.delete_branch
+    attempts = []
+
+    def forbidden_once(repo_name, branch):
+        # What the first attempt left for the retry.
+        attempts.append(github.leftovers().get(repo_name))
+        return len(attempts) > 1 and delete_branch(repo_name, branch)
+
+    monkeypatch.setattr(app.repo_serv, 'delete_branch', forbidden_once)
+    run_deletes = github.calls[RUN_DELETES]
+    scan(app, journal, 'repo-0001')
+    app.cleanup_queue.drain()
+    assert attempts[1] == {'branches': ['secret-scan'], 'runs': [], 'environments': False}
+    assert github.calls[RUN_DELETES] == run_deletes + 1
+    assert 'repo-0001' not in github.leftovers()
+    assert ScanJournal.reached(journal.state('repo-0001'), 'cleaned')
+
+
+def test_resumes_an_interrupted_scan_mid_run(app, github, journal, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(app.run_monitor, 'wait', mock.Mock(side_effect=KeyboardInterrupt))
+        with pytest.raises(KeyboardInterrupt):
+            scan(app, journal, 'repo-0003')
+    assert journal.state('repo-0003')['stage'] == 'run'
+    results = scan(app, journal, 'repo-0003')
+    app.cleanup_queue.drain()
+    assert results[LEAKED_KEY]['st'] == {'AWS_ACCESS_KEY_ID': True}
+    assert len([run for run in github.runs.values() if run['repo'] == 'repo-0003']) == 1
+    assert 'repo-0003' not in github.leftovers()
+
+
+def test_resume_past_the_results_does_not_look_up_the_run(app, github, journal, monkeypatch):
+    with monkeypatch.context() as patch:
+        # The clean up ran but the process died before journaling it.
+        patch.setattr(app.cleanup_queue, 'submit', lambda name, task, *args, on_done=None: task(*args))
+        results = scan(app, journal, 'repo-0006')
+    assert 'repo-0006' not in github.leftovers()
+    assert scan(app, journal, 'repo-0006') == results
+    app.cleanup_queue.drain()
+    assert ScanJournal.reached(journal.state('repo-0006'), 'cleaned')
+
+
+def test_cleans_up_orphans(app, github, journal, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(app.run_tracker, 'find_run', mock.Mock(side_effect=KeyboardInterrupt))
+        with pytest.raises(KeyboardInterrupt):
+            scan(app, journal, 'repo-0002')
+    assert journal.state('repo-0002')['stage'] == 'dispatched'
+    assert 'repo-0002' in github.leftovers()
+    assert app.clean_up_orphans(journal) == ['repo-0002']
+    assert 'repo-0002' not in github.leftovers()
+    assert [github.status(run) for run in github.runs.values() if run['repo'] == 'repo-0002'] == [
+        ('completed', 'cancelled')]
+    assert journal.unfinished() == {}
+
+
+def test_rejected_dispatch_is_not_journaled(app, github, journal, monkeypatch):
+    monkeypatch.setattr(github, 'dispatch', mock.Mock(side_effect=HttpError(422, 'Unexpected inputs provided')))
+    with pytest.raises(requests.HTTPError):
+        scan(app, journal, 'repo-0005')
+    assert journal.state('repo-0005')['stage'] == 'provisioned'
+    assert app.clean_up_orphans(journal) == ['repo-0005']
+    assert 'repo-0005' not in github.leftovers()
+
+
+def test_skips_repos_without_candidates(app, github, journal, monkeypatch):
+    for env in ('qa', 'st', 'pr'):
+        del github.repos['repo-0004']['secrets'][env]['AWS_ACCESS_KEY_ID']
+    get_secret_metadata = app.get_secret_metadata
+
+    def failing_for_repo_0000(repo_name):
+        if repo_name == 'repo-0000':
+            raise requests.ConnectionError('Connection reset by peer')
+        return get_secret_metadata(repo_name)
+
+    monkeypatch.setattr(app, 'get_secret_metadata', failing_for_repo_0000)
+    output = app.scan_repos([Repo(0, 'repo-0004', 'main'), Repo(0, 'repo-0000', 'main')], [LEAKED_KEY],
+                            journal=journal)
+    assert output['repo-0004'] == app.NO_CANDIDATES
+    assert journal.state('repo-0004')['stage'] == 'done'
+    assert not [run for run in github.runs.values() if run['repo'] == 'repo-0004']
+    # A failed pre-flight scans the repository anyway.
+    assert output['repo-0000'][LEAKED_KEY]['st'] == {'AWS_ACCESS_KEY_ID': True}
+    assert 'repo-0000' not in github.leftovers()
+
+
+def test_failed_run_fails_the_repo(app, github, journal, monkeypatch):
+    allows = github._allows
+    monkeypatch.setattr(github, '_allows', lambda environment, branch: environment['name'] != 'pr' and allows(
+        environment, branch))
+    with pytest.raises(RuntimeError, match='conclusion failure'):
+        scan(app, journal, 'repo-0007')
+    assert not ScanJournal.reached(journal.state('repo-0007'), 'results')
+    assert app.clean_up_orphans(journal) == ['repo-0007']
+    assert 'repo-0007' not in github.leftovers()
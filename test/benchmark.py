@@ -0,0 +1,132 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_github import LEAKED_KEY, FakeGithub
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BRANCH = 'secret-scan'
+
+
+def scan_settings(github, directory):
+    """
+    Builds the settings that point app.py at a FakeGithub, with every local file in a scratch directory.
+    Args:
+        github (FakeGithub): Running fake.
+        directory (str): Scratch directory.
+    Returns: (dict) Environment variables.
+    """
+    return {
+        'GITHUB_API_URL': github.url,
+        'GITHUB_TOKEN': 'fake-token',
+        'OWNER': github.owner,
+        'ORG': '',
+        'BRANCH': BRANCH,
+        'SECRET_PATTERN': '^AWS_ACCESS_KEY_ID$',
+        'AUTO_CONFIRM': 'true',
+        'INCREMENTAL_SCAN': 'false',
+        'WARM_BRANCHES': 'false',
+        'HTTP_CACHE_DIR': os.path.join(directory, 'github'),
+        'SCAN_STORE': os.path.join(directory, 'scans.db'),
+        'SCAN_JOURNAL': os.path.join(directory, 'scan-journal.jsonl'),
+        'FINGERPRINT_INDEX': os.path.join(directory, 'fingerprints.json'),
+        'METRICS_JSON': os.path.join(directory, 'metrics.json'),
+        'METRICS_PROM': '',
+    }
+
+
+def scan_output(stdout):
+    """
+    Finds the results dict the scan prints last.
+    Args: stdout (str): Output of app.py.
+    Returns: (dict) Results per repository name, empty when none was printed.
+    """
+    for line in reversed(stdout.splitlines()):
+        if line.startswith('{'):
+            try:
+                return ast.literal_eval(line)
+            except (ValueError, SyntaxError):
+                continue
+    return {}
+
+
+def found_leak(result):
+    return isinstance(result, dict) and any(any(secrets.values()) for secrets in result.get(LEAKED_KEY, {}).values())
+
+
+def run_benchmark(repos=20, queue_delay=2.0, run_delay=5.0, latency=0.0, settings=None, timeout=3600):
+    """
+    Runs a full `python app.py scan` over synthetic repositories served by a FakeGithub and measures it.
+    Args:
+        repos (int, optional): Repositories to scan. Defaults to 20.
+        queue_delay (float, optional): Seconds every run stays queued. Defaults to 2.
+        run_delay (float, optional): Seconds every run takes once approved. Defaults to 5.
+        latency (float, optional): Seconds added to every API answer. Defaults to 0.
+        settings (dict, optional): Environment variables of the scan, e.g. SCAN_CONCURRENCY or WRITE_INTERVAL.
+            The rest are taken from the environment as usual.
+        timeout (float, optional): Seconds the scan may take. Defaults to 3600.
+    Returns: (dict) Throughput, API calls and per repository latency of the scan, the leaks it found and what it
+        left behind.
+    """
+    with FakeGithub(repos=repos, queue_delay=queue_delay, run_delay=run_delay, latency=latency) as github, \
+            tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, **(settings or {}), **scan_settings(github, directory)}
+        started = time.monotonic()
+        process = subprocess.run([sys.executable, 'app.py', 'scan'], input=f'.*\n{LEAKED_KEY}\n', text=True,
+                                 capture_output=True, cwd=ROOT, env=env, timeout=timeout)
+        seconds = time.monotonic() - started
+        if process.returncode != 0:
+            raise RuntimeError(f"The scan failed:\n{process.stderr[-4000:]}")
+        with open(env['METRICS_JSON'], 'r') as file:
+            report = json.load(file)
+        output = scan_output(process.stdout)
+        calls = sum(github.calls.values())
+        latency_summary = report['stages'].get('repo', {}).get('latency', {})
+        return {
+            'repos': repos,
+            'scanned': len(output),
+            'seconds': seconds,
+            'repos_per_minute': repos / seconds * 60,
+            'api_calls': calls,
+            'api_calls_per_repo': calls / repos,
+            'calls': dict(github.calls.most_common()),
+            'repo_p50': latency_summary.get('p50', 0),
+            'repo_p95': latency_summary.get('p95', 0),
+            'leaks_expected': github.leaked_repos(),
+            'leaks_found': sorted(name for name, result in output.items() if found_leak(result)),
+            'leftovers': github.leftovers(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scan throughput benchmark against a local fake GitHub API.')
+    parser.add_argument('--repos', type=int, default=20, help='Synthetic repositories to scan.')
+    parser.add_argument('--queue-delay', type=float, default=2.0, help='Seconds every run stays queued.')
+    parser.add_argument('--run-delay', type=float, default=5.0, help='Seconds every run takes once approved.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every API answer.')
+    parser.add_argument('--set', action='append', default=[], metavar='NAME=VALUE',
+                        help='Setting of the scan, e.g. --set SCAN_CONCURRENCY=8. Can be repeated.')
+    parser.add_argument('--json', help='File to write the full result to.')
+    args = parser.parse_args()
+    settings = dict(setting.split('=', 1) for setting in args.set)
+    result = run_benchmark(args.repos, args.queue_delay, args.run_delay, args.latency, settings)
+    print(f"Scanned {result['scanned']}/{result['repos']} repos in {result['seconds']:.1f}s")
+    print(f"Throughput:     {result['repos_per_minute']:.1f} repos/min")
+    print(f"API calls:      {result['api_calls']} ({result['api_calls_per_repo']:.1f} per repo)")
+    print(f"Repo latency:   p50 {result['repo_p50']:.2f}s, p95 {result['repo_p95']:.2f}s")
+    print(f"Leaks found:    {len(result['leaks_found'])}/{len(result['leaks_expected'])}")
+    print(f"Leftovers:      {result['leftovers'] or 'none'}")
+    for endpoint, count in result['calls'].items():
+        print(f"  {count:6d}  {endpoint}")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
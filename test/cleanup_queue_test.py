@@ -0,0 +1,43 @@
+import threading
+
+from services.cleanup_queue import CleanupQueue
+
+
+def test_retries_failing_task():
+    cleanup_queue = CleanupQueue(max_workers=2, retries=2, backoff=0)
+    attempts = []
+    done = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError('try again')
+
+    cleanup_queue.submit('flaky', flaky, on_done=lambda: done.append(True))
+    assert cleanup_queue.drain() == 0
+    assert len(attempts) == 3
+    assert done == [True]
+    assert cleanup_queue.failed == 0
+
+
+def test_gives_up_after_retries():
+    cleanup_queue = CleanupQueue(max_workers=1, retries=1, backoff=0)
+    done = []
+
+    def broken():
+        raise RuntimeError('broken')
+
+    cleanup_queue.submit('broken', broken, on_done=lambda: done.append(True))
+    cleanup_queue.drain()
+    assert cleanup_queue.failed == 1
+    assert done == []
+
+
+def test_drain_times_out():
+    cleanup_queue = CleanupQueue(max_workers=1, retries=0, backoff=0)
+    release = threading.Event()
+    cleanup_queue.submit('blocked', release.wait)
+    assert cleanup_queue.drain(timeout=0.05) == 1
+    release.set()
+    assert cleanup_queue.drain() == 0
+    assert cleanup_queue.pending() == 0
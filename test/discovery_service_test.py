@@ -0,0 +1,31 @@
+import pytest
+
+from services.discovery_service import DiscoveryService
+from services.github_client import GithubClient
+
+
+@pytest.fixture
+def discovery_service():
+    yield DiscoveryService('token', 'owner', GithubClient('token', cache=False))
+
+
+def test_build_query_aliases_every_repo(discovery_service):
+    query = discovery_service.build_query(3)
+    assert 'r2: repository(owner: $owner, name: $n2)' in query
+    assert '$n0: String!, $n1: String!, $n2: String!' in query
+
+
+def test_to_repo_hydrates_entities(discovery_service):
+    repo = discovery_service.to_repo({
+        'databaseId': 7,
+        'name': 'api',
+        'defaultBranchRef': {'name': 'main', 'target': {'oid': 'abc', 'tree': {'oid': 'def'}}},
+        'workflows': {'entries': [
+            {'name': 'ci.yml', 'path': '.github/workflows/ci.yml', 'type': 'blob'},
+            {'name': 'README.md', 'path': '.github/workflows/README.md', 'type': 'blob'},
+        ]},
+        'environments': {'nodes': [{'databaseId': 1, 'name': 'pr'}, {'databaseId': 2, 'name': 'st'}]},
+    })
+    assert (repo.id, repo.default_branch, repo.head_sha, repo.tree_sha) == (7, 'main', 'abc', 'def')
+    assert [workflow.id for workflow in repo.workflows] == ['ci.yml']
+    assert repo.environments == {'pr': 1, 'st': 2}
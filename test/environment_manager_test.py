@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from services.environment_manager import EnvironmentManager
+
+REVIEWED = {
+    'protection_rules': [
+        {'type': 'wait_timer', 'wait_timer': 30},
+        {'type': 'required_reviewers', 'prevent_self_review': True,
+         'reviewers': [{'type': 'User', 'reviewer': {'id': 42}}]},
+    ],
+    'deployment_branch_policy': {'protected_branches': True, 'custom_branch_policies': False},
+    'can_admins_bypass': False,
+}
+
+
+class FakeRepoService:
+
+    def __init__(self, environments):
+        self.environments = environments
+        self.policies = {}
+        self.writes = []
+        self._lock = threading.Lock()
+
+    def get_environment(self, repo, environment_name):
+        return self.environments.get(environment_name)
+
+    def list_deployment_branch_policies(self, repo, environment_name):
+        return [{'id': policy_id, 'name': name} for name, policy_id in self.policies.get(environment_name, {}).items()]
+
+    def put_environment(self, repo, environment_name, config):
+        with self._lock:
+            self.writes.append(('PUT', environment_name, config))
+        rules = [{'type': 'wait_timer', 'wait_timer': config['wait_timer']}]
+        if config['reviewers']:
+            rules.append({'type': 'required_reviewers', 'prevent_self_review': config['prevent_self_review'],
+                          'reviewers': [{'type': r['type'], 'reviewer': {'id': r['id']}} for r in config['reviewers']]})
+        self.environments[environment_name] = {'protection_rules': rules,
+                                               'deployment_branch_policy': config['deployment_branch_policy'],
+                                               'can_admins_bypass': config.get('can_admins_bypass', True)}
+
+    def create_deployment_branch_policy(self, repo, environment_name, name=None):
+        with self._lock:
+            self.writes.append(('POST', environment_name, name))
+            policy_id = len(self.writes)
+        self.policies.setdefault(environment_name, {})[name] = policy_id
+        return {'id': policy_id, 'name': name}
+
+    def delete_deployment_branch_policy(self, repo, environment_name, policy_id):
+        with self._lock:
+            self.writes.append(('DELETE', environment_name, policy_id))
+        policies = self.policies[environment_name]
+        del policies[next(name for name, value in policies.items() if value == policy_id)]
+
+    def delete_environment(self, repo, environment_name):
+        with self._lock:
+            self.writes.append(('DELETE', environment_name, None))
+        del self.environments[environment_name]
+
+
+@pytest.fixture
+def repo_service():
+    yield FakeRepoService({'st': dict(REVIEWED)})
+
+
+def test_restores_original_config(repo_service):
+    manager = EnvironmentManager(repo_service)
+    original = manager.snapshot('repo', 'st')
+    states = manager.prepare('repo', ['st', 'pr'], 'scan')
+    assert manager.is_prepared(manager.snapshot('repo', 'st'), 'scan')
+    assert manager.snapshot('repo', 'st')['config']['reviewers'] == [{'type': 'User', 'id': 42}]
+    manager.restore('repo', states)
+    assert manager.snapshot('repo', 'st') == original
+    assert 'pr' not in repo_service.environments
+
+
+def test_prepared_environment_is_not_written(repo_service):
+    manager = EnvironmentManager(repo_service)
+    first = manager.prepare('repo', ['st'], 'scan')
+    writes = len(repo_service.writes)
+    second = manager.prepare('repo', ['st'], 'scan')
+    assert len(repo_service.writes) == writes
+    manager.restore('repo', manager.merge(first, second))
+    assert manager.snapshot('repo', 'st')['config']['wait_timer'] == 30
+    assert repo_service.policies['st'] == {}
+
+
+def test_failed_prepare_restores_the_other_environments(repo_service):
+    repo_service.environments['pr'] = dict(REVIEWED)
+    put_environment = repo_service.put_environment
+
+    def failing_put(repo, environment_name, config):
+        if environment_name == 'st' and config['wait_timer'] == 0:
+            raise RuntimeError('forbidden')
+        put_environment(repo, environment_name, config)
+
+    repo_service.put_environment = failing_put
+    manager = EnvironmentManager(repo_service)
+    original = manager.snapshot('repo', 'pr')
+    with pytest.raises(RuntimeError):
+        manager.prepare('repo', ['st', 'pr'], 'scan')
+    assert manager.snapshot('repo', 'pr') == original
+    assert repo_service.policies.get('pr', {}) == {}
+
+
+def test_keeps_admin_bypass_disabled(repo_service):
+    manager = EnvironmentManager(repo_service)
+    states = manager.prepare('repo', ['st'], 'scan')
+    assert repo_service.environments['st']['can_admins_bypass'] is False
+    manager.restore('repo', states)
+    assert repo_service.environments['st']['can_admins_bypass'] is False
+    assert all(config['can_admins_bypass'] is False for method, _, config in repo_service.writes if method == 'PUT')
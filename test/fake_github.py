@@ -0,0 +1,696 @@
+import fnmatch
+import hashlib
+import hmac
+import io
+import itertools
+import json
+import math
+import re
+import threading
+import time
+import zipfile
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Environments of the secret.yml matrix; the protected ones make a run wait for an approval.
+WORKFLOW_ENVIRONMENTS = ['qa', 'st', 'pr']
+PROTECTED_ENVIRONMENTS = ['st', 'pr']
+# Value of the secret planted in every leak_every-th repository, for the scans to find.
+LEAKED_KEY = 'AKIAFAKELEAKED000000'
+WORKFLOW_PATH = '.github/workflows/ci.yml'
+UPDATED_AT = '2026-01-01T00:00:00Z'
+
+ROUTES = [
+    ('GET', '/users/{owner}/repos', 'list_repos'),
+    ('GET', '/orgs/{owner}/repos', 'list_repos'),
+    ('GET', '/repos/{owner}/{repo}/actions/secrets', 'list_secrets'),
+    ('GET', '/repos/{owner}/{repo}/actions/organization-secrets', 'list_organization_secrets'),
+    ('GET', '/repos/{owner}/{repo}/actions/workflows', 'list_workflows'),
+    ('GET', '/repos/{owner}/{repo}/actions/workflows/{workflow}', 'get_workflow'),
+    ('POST', '/repos/{owner}/{repo}/actions/workflows/{workflow}/dispatches', 'dispatch'),
+    ('GET', '/repos/{owner}/{repo}/actions/workflows/{workflow}/runs', 'list_runs'),
+    ('GET', '/repos/{owner}/{repo}/commits/{ref}', 'get_commit'),
+    ('POST', '/repos/{owner}/{repo}/git/trees', 'create_tree'),
+    ('POST', '/repos/{owner}/{repo}/git/commits', 'create_commit'),
+    ('POST', '/repos/{owner}/{repo}/git/refs', 'create_ref'),
+    ('PATCH', '/repos/{owner}/{repo}/git/refs/heads/{branch+}', 'update_ref'),
+    ('DELETE', '/repos/{owner}/{repo}/git/refs/heads/{branch+}', 'delete_ref'),
+    ('GET', '/repos/{owner}/{repo}/contents/{path+}', 'get_contents'),
+    ('GET', '/repos/{owner}/{repo}/environments', 'list_environments'),
+    ('GET', '/repos/{owner}/{repo}/environments/{environment}', 'get_environment'),
+    ('PUT', '/repos/{owner}/{repo}/environments/{environment}', 'put_environment'),
+    ('DELETE', '/repos/{owner}/{repo}/environments/{environment}', 'delete_environment'),
+    ('GET', '/repos/{owner}/{repo}/environments/{environment}/secrets', 'list_secrets'),
+    ('GET', '/repos/{owner}/{repo}/environments/{environment}/deployment-branch-policies', 'list_policies'),
+    ('POST', '/repos/{owner}/{repo}/environments/{environment}/deployment-branch-policies', 'create_policy'),
+    ('DELETE', '/repos/{owner}/{repo}/environments/{environment}/deployment-branch-policies/{policy_id}',
+     'delete_policy'),
+    ('GET', '/repos/{owner}/{repo}/actions/runs/{run_id}', 'get_run'),
+    ('DELETE', '/repos/{owner}/{repo}/actions/runs/{run_id}', 'delete_run'),
+    ('POST', '/repos/{owner}/{repo}/actions/runs/{run_id}/cancel', 'cancel_run'),
+    ('GET', '/repos/{owner}/{repo}/actions/runs/{run_id}/pending_deployments', 'list_pending_deployments'),
+    ('POST', '/repos/{owner}/{repo}/actions/runs/{run_id}/pending_deployments', 'review_pending_deployments'),
+    ('GET', '/repos/{owner}/{repo}/actions/runs/{run_id}/artifacts', 'list_artifacts'),
+    ('GET', '/repos/{owner}/{repo}/actions/artifacts/{artifact_id}/zip', 'download_artifact'),
+    ('POST', '/graphql', 'graphql'),
+]
+
+
+def route_pattern(template):
+    """
+    Turns a route template into a regular expression, {name} matching one path segment and {name+} the rest.
+    Args: template (str): Route template, e.g. /repos/{owner}/{repo}.
+    Returns: (re.Pattern) Compiled pattern with one named group per parameter.
+    """
+    pattern = re.sub(r'\{(\w+)\+}', r'(?P<\1>.+)', template)
+    return re.compile('^' + re.sub(r'\{(\w+)}', r'(?P<\1>[^/]+)', pattern) + '$')
+
+
+def git_sha(kind, content):
+    return hashlib.sha1(b'%s %d\0' % (kind.encode(), len(content)) + content).hexdigest()
+
+
+def timestamp(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def zip_bytes(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+class HttpError(Exception):
+    """
+    An error answered to the client with its status code and a GitHub style message.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class FakeGithub:
+    """
+    An in-memory stand-in for the GitHub REST and GraphQL endpoints the scan pipeline calls, served over HTTP on
+    localhost. Listings are paginated with Link headers, GET answers carry ETags and honour If-None-Match, every
+    answer carries the rate limit headers, and dispatched runs go through queued, waiting for the approval of
+    the protected environments, in progress and completed, leaving the result artifacts the secret.yml
+    workflow would upload.
+    """
+
+    def __init__(self, repos=10, owner='bench', queue_delay=1.0, run_delay=2.0, latency=0.0, rate_limit=100000,
+                 leak_every=3):
+        """
+        Initializes the FakeGithub with synthetic repositories.
+        Args:
+            repos (int, optional): Repositories of the owner. Defaults to 10.
+            owner (str, optional): User or organization owning them. Defaults to 'bench'.
+            queue_delay (float, optional): Seconds a run stays queued. Defaults to 1.
+            run_delay (float, optional): Seconds a run stays in progress once approved. Defaults to 2.
+            latency (float, optional): Seconds added to every answer. Defaults to 0.
+            rate_limit (int, optional): Calls allowed per resource before answering 403. Defaults to 100000.
+            leak_every (int, optional): Every leak_every-th repository holds LEAKED_KEY in its 'st' environment.
+                Defaults to 3.
+        """
+        self.owner = owner
+        self.queue_delay = queue_delay
+        self.run_delay = run_delay
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.remaining = {'core': rate_limit, 'graphql': rate_limit}
+        self.reset_at = int(time.time()) + 3600
+        self.calls = Counter()
+        self.trees = {}
+        self.commits = {}
+        self.runs = {}
+        self._ids = itertools.count(1000)
+        self._lock = threading.Lock()
+        self._routes = [(method, route_pattern(template), template, handler) for method, template, handler in ROUTES]
+        self.repos = {}
+        for index in range(repos):
+            repo = self._create_repo(index, leaked=leak_every and index % leak_every == 0)
+            self.repos[repo['name']] = repo
+        self.server = None
+
+    def _create_repo(self, index, leaked):
+        tree = self._store_tree({WORKFLOW_PATH: git_sha('blob', b'name: CI\non: push\n')})
+        head = self._store_commit(tree, [], 'Initial commit')
+        environments = {}
+        for env in WORKFLOW_ENVIRONMENTS:
+            protected = env in PROTECTED_ENVIRONMENTS
+            environments[env] = {
+                'id': next(self._ids), 'name': env, 'wait_timer': 0, 'prevent_self_review': False,
+                'reviewers': [{'type': 'User', 'id': 1}] if protected else [],
+                'deployment_branch_policy': {'protected_branches': True, 'custom_branch_policies': False}
+                if protected else None,
+                'can_admins_bypass': not protected, 'policies': {},
+            }
+        secrets = {
+            'repo': {'AWS_REGION': 'us-east-1'},
+            **{env: {'AWS_ACCESS_KEY_ID': f'AKIA{env.upper()}{index:014d}',
+                     'AWS_SECRET_ACCESS_KEY': hashlib.sha256(f'{env}{index}'.encode()).hexdigest(),
+                     'DB_PASSWORD': f'password-{env}-{index}'} for env in WORKFLOW_ENVIRONMENTS},
+        }
+        if leaked:
+            secrets['st']['AWS_ACCESS_KEY_ID'] = LEAKED_KEY
+        return {
+            'id': next(self._ids), 'name': f'repo-{index:04d}', 'default_branch': 'main', 'refs': {'main': head},
+            'workflow': {'id': next(self._ids), 'name': 'CI', 'path': WORKFLOW_PATH},
+            'environments': environments, 'original_environments': json.dumps(environments, sort_keys=True),
+            'secrets': secrets, 'leaked': bool(leaked),
+        }
+
+    def _store_tree(self, files):
+        sha = git_sha('tree', json.dumps(sorted(files.items())).encode())
+        self.trees[sha] = dict(files)
+        return sha
+
+    def _store_commit(self, tree, parents, message):
+        sha = git_sha('commit', json.dumps([tree, parents, message]).encode())
+        self.commits[sha] = {'tree': tree, 'parents': parents, 'message': message}
+        return sha
+
+    def start(self):
+        """
+        Starts serving on a free localhost port, in a background thread.
+        Returns: (FakeGithub) The started server.
+        """
+        self.server = FakeGithubServer(('127.0.0.1', 0), FakeGithubHandler)
+        self.server.github = self
+        threading.Thread(target=self.server.serve_forever, name='fake-github', daemon=True).start()
+        return self
+
+    def stop(self):
+        """
+        Stops serving.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def url(self):
+        """
+        Base URL to set as GITHUB_API_URL.
+        Returns: (str) URL of the running server.
+        """
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def handle(self, method, url, headers, body):
+        """
+        Answers a request.
+        Args:
+            method (str): HTTP method.
+            url (str): Path and query string of the request.
+            headers (dict): Request headers.
+            body (bytes): Request body.
+        Returns: (tuple) Status code, headers and body of the answer.
+        """
+        parsed = urlparse(url)
+        query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        base_url = f'http://{headers.get("Host")}'
+        resource = 'graphql' if parsed.path == '/graphql' else 'core'
+        with self._lock:
+            for route_method, pattern, template, handler in self._routes:
+                match = pattern.match(parsed.path)
+                if match and route_method == method:
+                    self.calls[f'{method} {template}'] += 1
+                    break
+            else:
+                self.calls[f'{method} unknown'] += 1
+                handler = None
+            if self.remaining[resource] <= 0:
+                status, answer_headers, answer = 403, {}, {'message': 'API rate limit exceeded'}
+            elif handler is None:
+                status, answer_headers, answer = 404, {}, {'message': 'Not Found'}
+            else:
+                try:
+                    data = json.loads(body) if body else {}
+                    status, answer_headers, answer = getattr(self, handler)(
+                        match.groupdict(), query, data, base_url, parsed.path)
+                except HttpError as e:
+                    status, answer_headers, answer = e.status, {}, {'message': e.message}
+            if isinstance(answer, (dict, list)):
+                answer = json.dumps(answer).encode()
+                answer_headers.setdefault('Content-Type', 'application/json; charset=utf-8')
+            elif isinstance(answer, str):
+                answer = answer.encode()
+                answer_headers.setdefault('Content-Type', 'text/plain; charset=utf-8')
+            if method == 'GET' and status == 200:
+                etag = f'"{hashlib.sha1(answer).hexdigest()}"'
+                answer_headers['ETag'] = etag
+                if headers.get('If-None-Match') == etag:
+                    # Conditional requests answered 304 don't count against the rate limit.
+                    status, answer = 304, b''
+            if status != 304 and status != 403:
+                self.remaining[resource] -= 1
+            answer_headers.update({
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(max(self.remaining[resource], 0)),
+                'X-RateLimit-Reset': str(self.reset_at),
+                'X-RateLimit-Resource': resource,
+            })
+            return status, answer_headers, answer or b''
+
+    @staticmethod
+    def paginate(items, query, base_url, path, key=None):
+        per_page = min(int(query.get('per_page', 30)), 100)
+        page = int(query.get('page', 1))
+        last = max(math.ceil(len(items) / per_page), 1)
+        links = []
+        for rel, number in (('next', page + 1), ('last', last)):
+            if page < last:
+                links.append(f'<{base_url}{path}?{urlencode({**query, "page": number})}>; rel="{rel}"')
+        headers = {'Link': ', '.join(links)} if links else {}
+        selected = items[(page - 1) * per_page:page * per_page]
+        return 200, headers, {'total_count': len(items), key: selected} if key else selected
+
+    def _repo(self, params):
+        repo = self.repos.get(params['repo']) if params['owner'] == self.owner else None
+        if repo is None:
+            raise HttpError(404, 'Not Found')
+        return repo
+
+    def _environment(self, repo, name):
+        environment = repo['environments'].get(name)
+        if environment is None:
+            raise HttpError(404, 'Not Found')
+        return environment
+
+    def _run(self, repo, run_id):
+        run = self.runs.get(int(run_id))
+        if run is None or run['repo'] != repo['name'] or run['deleted']:
+            raise HttpError(404, 'Not Found')
+        return run
+
+    def _resolve(self, repo, ref):
+        if ref == 'HEAD':
+            ref = repo['default_branch']
+        return repo['refs'].get(ref) or (ref if ref in self.commits else None)
+
+    def list_repos(self, params, query, data, base_url, path):
+        if params['owner'] != self.owner:
+            raise HttpError(404, 'Not Found')
+        items = [{'id': repo['id'], 'name': name, 'full_name': f'{self.owner}/{name}', 'private': True,
+                  'default_branch': repo['default_branch']} for name, repo in self.repos.items()]
+        return self.paginate(items, query, base_url, path)
+
+    def list_secrets(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        scope = params.get('environment') or 'repo'
+        if scope != 'repo':
+            self._environment(repo, scope)
+        items = [{'name': name, 'created_at': UPDATED_AT, 'updated_at': UPDATED_AT}
+                 for name in sorted(repo['secrets'].get(scope, {}))]
+        return self.paginate(items, query, base_url, path, 'secrets')
+
+    def list_organization_secrets(self, params, query, data, base_url, path):
+        self._repo(params)
+        return self.paginate([], query, base_url, path, 'secrets')
+
+    def _workflow(self, repo, workflow_id):
+        workflow = repo['workflow']
+        if workflow_id not in (str(workflow['id']), workflow['path'].rsplit('/', 1)[-1]):
+            raise HttpError(404, 'Not Found')
+        return {**workflow, 'node_id': f'W_{workflow["id"]}', 'state': 'active'}
+
+    def list_workflows(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        return 200, {}, {'total_count': 1, 'workflows': [self._workflow(repo, str(repo['workflow']['id']))]}
+
+    def get_workflow(self, params, query, data, base_url, path):
+        return 200, {}, self._workflow(self._repo(params), params['workflow'])
+
+    def get_commit(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        sha = self._resolve(repo, params['ref'])
+        if sha is None:
+            raise HttpError(422, f'No commit found for SHA: {params["ref"]}')
+        commit = self.commits[sha]
+        return 200, {}, {'sha': sha, 'commit': {'message': commit['message'], 'tree': {'sha': commit['tree']}},
+                         'parents': [{'sha': parent} for parent in commit['parents']]}
+
+    def create_tree(self, params, query, data, base_url, path):
+        self._repo(params)
+        if data.get('base_tree') not in self.trees:
+            raise HttpError(422, 'base_tree is not a valid tree oid')
+        files = dict(self.trees[data['base_tree']])
+        for entry in data.get('tree', []):
+            files[entry['path']] = git_sha('blob', entry['content'].encode())
+        return 201, {}, {'sha': self._store_tree(files), 'truncated': False}
+
+    def create_commit(self, params, query, data, base_url, path):
+        self._repo(params)
+        if data.get('tree') not in self.trees or any(parent not in self.commits for parent in data['parents']):
+            raise HttpError(422, 'Tree SHA does not exist')
+        sha = self._store_commit(data['tree'], data['parents'], data['message'])
+        return 201, {}, {'sha': sha, 'tree': {'sha': data['tree']}}
+
+    def create_ref(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        branch = data['ref'].removeprefix('refs/heads/')
+        if branch in repo['refs']:
+            raise HttpError(422, 'Reference already exists')
+        if data['sha'] not in self.commits:
+            raise HttpError(422, 'Object does not exist')
+        repo['refs'][branch] = data['sha']
+        return 201, {}, {'ref': data['ref'], 'object': {'sha': data['sha'], 'type': 'commit'}}
+
+    def update_ref(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        if params['branch'] not in repo['refs']:
+            raise HttpError(422, 'Reference does not exist')
+        repo['refs'][params['branch']] = data['sha']
+        return 200, {}, {'ref': f'refs/heads/{params["branch"]}', 'object': {'sha': data['sha'], 'type': 'commit'}}
+
+    def delete_ref(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        if repo['refs'].pop(params['branch'], None) is None:
+            raise HttpError(422, 'Reference does not exist')
+        return 204, {}, None
+
+    def get_contents(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        sha = self._resolve(repo, query.get('ref', 'HEAD'))
+        blob = self.trees[self.commits[sha]['tree']].get(params['path']) if sha else None
+        if blob is None:
+            raise HttpError(404, 'Not Found')
+        return 200, {}, {'type': 'file', 'name': params['path'].rsplit('/', 1)[-1], 'path': params['path'],
+                         'sha': blob}
+
+    @staticmethod
+    def _environment_json(environment):
+        rules = []
+        if environment['wait_timer']:
+            rules.append({'id': environment['id'] * 10, 'type': 'wait_timer', 'wait_timer': environment['wait_timer']})
+        if environment['reviewers']:
+            rules.append({'id': environment['id'] * 10 + 1, 'type': 'required_reviewers',
+                          'prevent_self_review': environment['prevent_self_review'],
+                          'reviewers': [{'type': reviewer['type'], 'reviewer': {'id': reviewer['id']}}
+                                        for reviewer in environment['reviewers']]})
+        return {'id': environment['id'], 'node_id': f'EN_{environment["id"]}', 'name': environment['name'],
+                'protection_rules': rules, 'deployment_branch_policy': environment['deployment_branch_policy'],
+                'can_admins_bypass': environment['can_admins_bypass']}
+
+    def list_environments(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        items = [self._environment_json(environment) for environment in repo['environments'].values()]
+        return 200, {}, {'total_count': len(items), 'environments': items}
+
+    def get_environment(self, params, query, data, base_url, path):
+        return 200, {}, self._environment_json(self._environment(self._repo(params), params['environment']))
+
+    def put_environment(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        environment = repo['environments'].setdefault(params['environment'], {
+            'id': next(self._ids), 'name': params['environment'], 'policies': {}})
+        environment.update({
+            'wait_timer': data.get('wait_timer') or 0,
+            'prevent_self_review': data.get('prevent_self_review', False),
+            'reviewers': [{'type': reviewer['type'], 'id': reviewer['id']} for reviewer in data.get('reviewers') or []],
+            'deployment_branch_policy': data.get('deployment_branch_policy'),
+            # Like GitHub, a PUT without it lets admins bypass the protection rules again.
+            'can_admins_bypass': data.get('can_admins_bypass', True),
+        })
+        return 200, {}, self._environment_json(environment)
+
+    def delete_environment(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        if repo['environments'].pop(params['environment'], None) is None:
+            raise HttpError(404, 'Not Found')
+        return 204, {}, None
+
+    def _custom_policies(self, params):
+        environment = self._environment(self._repo(params), params['environment'])
+        if not (environment['deployment_branch_policy'] or {}).get('custom_branch_policies'):
+            raise HttpError(404, 'Not Found')
+        return environment
+
+    def list_policies(self, params, query, data, base_url, path):
+        environment = self._custom_policies(params)
+        items = [{'id': policy_id, 'node_id': f'DBP_{policy_id}', 'name': name, 'type': 'branch'}
+                 for policy_id, name in sorted(environment['policies'].items())]
+        return self.paginate(items, query, base_url, path, 'branch_policies')
+
+    def create_policy(self, params, query, data, base_url, path):
+        environment = self._custom_policies(params)
+        policy_id = next(self._ids)
+        environment['policies'][policy_id] = data['name']
+        return 200, {}, {'id': policy_id, 'node_id': f'DBP_{policy_id}', 'name': data['name'], 'type': 'branch'}
+
+    def delete_policy(self, params, query, data, base_url, path):
+        environment = self._environment(self._repo(params), params['environment'])
+        if environment['policies'].pop(int(params['policy_id']), None) is None:
+            raise HttpError(404, 'Not Found')
+        return 204, {}, None
+
+    @staticmethod
+    def _allows(environment, branch):
+        policy = environment['deployment_branch_policy']
+        if not policy:
+            return True
+        if policy.get('protected_branches'):
+            return False
+        return any(fnmatch.fnmatchcase(branch, name) for name in environment['policies'].values())
+
+    def dispatch(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        workflow = self._workflow(repo, params['workflow'])
+        if data.get('ref') not in repo['refs']:
+            raise HttpError(422, f'No ref found for: {data.get("ref")}')
+        run_id = next(self._ids)
+        environments = {env: repo['environments'].get(env) for env in WORKFLOW_ENVIRONMENTS}
+        now = time.time()
+        self.runs[run_id] = {
+            'id': run_id, 'node_id': f'WFR_{run_id}', 'repo': repo['name'], 'workflow_id': workflow['id'],
+            'head_branch': data['ref'], 'inputs': data.get('inputs', {}), 'created': now,
+            'created_at': timestamp(now), 'approved_at': None, 'cancelled_at': None, 'deleted': False,
+            # Jobs of environments that don't allow the branch fail, the others read the secrets.
+            'allowed': [env for env, environment in environments.items()
+                        if environment is not None and self._allows(environment, data['ref'])],
+            'pending': {environment['id']: env for env, environment in environments.items()
+                        if environment is not None and environment['reviewers'] and self._allows(environment,
+                                                                                               data['ref'])},
+        }
+        return 204, {}, None
+
+    def status(self, run, now=None):
+        """
+        Works out where a run is in its life cycle.
+        Args:
+            run (dict): Run.
+            now (float, optional): Current time. Defaults to time.time().
+        Returns: (tuple) Status and conclusion, None until the run is completed.
+        """
+        now = now or time.time()
+        if run['cancelled_at'] is not None:
+            return 'completed', 'cancelled'
+        if now - run['created'] < self.queue_delay:
+            return 'queued', None
+        if run['pending']:
+            return 'waiting', None
+        started = max(run['created'] + self.queue_delay, run['approved_at'] or 0)
+        if now - started < self.run_delay:
+            return 'in_progress', None
+        return 'completed', 'success' if len(run['allowed']) == len(WORKFLOW_ENVIRONMENTS) else 'failure'
+
+    def _run_json(self, run):
+        status, conclusion = self.status(run)
+        return {'id': run['id'], 'node_id': run['node_id'], 'name': 'secret workflow',
+                'head_branch': run['head_branch'], 'event': 'workflow_dispatch', 'status': status,
+                'conclusion': conclusion, 'workflow_id': run['workflow_id'], 'run_attempt': 1,
+                'created_at': run['created_at']}
+
+    def list_runs(self, params, query, data, base_url, path):
+        repo = self._repo(params)
+        workflow = self._workflow(repo, params['workflow'])
+        since = query.get('created', '').removeprefix('>=')
+        runs = [self._run_json(run) for run in self.runs.values()
+                if run['repo'] == repo['name'] and run['workflow_id'] == workflow['id'] and not run['deleted']
+                and query.get('branch', run['head_branch']) == run['head_branch']
+                and query.get('event', 'workflow_dispatch') == 'workflow_dispatch' and run['created_at'] >= since]
+        runs.sort(key=lambda run: run['created_at'], reverse=True)
+        return self.paginate(runs, query, base_url, path, 'workflow_runs')
+
+    def get_run(self, params, query, data, base_url, path):
+        return 200, {}, self._run_json(self._run(self._repo(params), params['run_id']))
+
+    def delete_run(self, params, query, data, base_url, path):
+        run = self._run(self._repo(params), params['run_id'])
+        if self.status(run)[0] != 'completed':
+            raise HttpError(409, 'Cannot delete a run that is not completed')
+        run['deleted'] = True
+        return 204, {}, None
+
+    def cancel_run(self, params, query, data, base_url, path):
+        run = self._run(self._repo(params), params['run_id'])
+        if self.status(run)[0] == 'completed':
+            raise HttpError(409, 'Cannot cancel a workflow run that is completed.')
+        run['cancelled_at'] = time.time()
+        return 202, {}, {}
+
+    def list_pending_deployments(self, params, query, data, base_url, path):
+        run = self._run(self._repo(params), params['run_id'])
+        if self.status(run)[0] != 'waiting':
+            return 200, {}, []
+        return 200, {}, [{'environment': {'id': env_id, 'node_id': f'EN_{env_id}', 'name': env}, 'wait_timer': 0,
+                          'current_user_can_approve': True, 'reviewers': []}
+                         for env_id, env in run['pending'].items()]
+
+    def review_pending_deployments(self, params, query, data, base_url, path):
+        run = self._run(self._repo(params), params['run_id'])
+        approved = [env_id for env_id in data.get('environment_ids', []) if env_id in run['pending']]
+        if self.status(run)[0] != 'waiting' or not approved:
+            raise HttpError(422, 'No pending deployment requests to approve or reject')
+        deployments = [{'id': next(self._ids), 'environment': run['pending'].pop(env_id), 'ref': run['head_branch']}
+                       for env_id in approved]
+        if data.get('state') == 'rejected':
+            run['cancelled_at'] = time.time()
+        elif not run['pending']:
+            run['approved_at'] = time.time()
+        return 200, {}, deployments
+
+    def results(self, run):
+        """
+        Builds the results the secret.yml jobs of a run upload, one payload per environment allowed to run.
+        Args: run (dict): Completed run.
+        Returns: (dict) Environment mapped to its result payload.
+        """
+        repo = self.repos[run['repo']]
+        inputs = run['inputs']
+        keys = [key for key in inputs.get('access_key_ids', '').split(',') if key]
+        pattern = re.compile(inputs.get('filter_secret_pattern', ''))
+        salt = inputs.get('fingerprint_salt', '')
+        payloads = {}
+        for env in run['allowed']:
+            secrets = {**repo['secrets']['repo'], **repo['secrets'].get(env, {})}
+            matching = {name: value for name, value in secrets.items() if pattern.search(name)}
+            payload = {'environment': env, 'secrets': {name: [value == key for key in keys]
+                                                       for name, value in matching.items()}}
+            if salt:
+                payload['fingerprints'] = {name: hmac.new(salt.encode(), value.encode(), hashlib.sha256).hexdigest()
+                                           for name, value in matching.items()}
+            payloads[env] = payload
+        return payloads
+
+    def _completed_run(self, params):
+        run = self._run(self._repo(params), params['run_id'])
+        if self.status(run)[0] != 'completed':
+            return run, {}
+        return run, self.results(run)
+
+    def list_artifacts(self, params, query, data, base_url, path):
+        run, payloads = self._completed_run(params)
+        artifacts = [{'id': run['id'] * 10 + index, 'name': f'secret-results-{env}', 'expired': False,
+                      'archive_download_url': f'{base_url}/repos/{self.owner}/{run["repo"]}/actions/artifacts/'
+                                              f'{run["id"] * 10 + index}/zip'}
+                     for index, env in enumerate(WORKFLOW_ENVIRONMENTS) if env in payloads]
+        return self.paginate(artifacts, query, base_url, path, 'artifacts')
+
+    def download_artifact(self, params, query, data, base_url, path):
+        run_id, index = divmod(int(params['artifact_id']), 10)
+        run, payloads = self._completed_run({**params, 'run_id': run_id})
+        env = WORKFLOW_ENVIRONMENTS[index] if index < len(WORKFLOW_ENVIRONMENTS) else None
+        if env not in payloads:
+            raise HttpError(404, 'Not Found')
+        return 200, {'Content-Type': 'application/zip'}, zip_bytes({f'{env}.json': json.dumps(payloads[env])})
+
+    def graphql(self, params, query, data, base_url, path):
+        document, variables = data.get('query', ''), data.get('variables') or {}
+        if 'nodes(ids:' in document:
+            return 200, {}, {'data': {'nodes': [self._run_node(node_id) for node_id in variables.get('ids', [])]}}
+        aliases = re.findall(r'(\w+): repository\(owner: \$owner, name: \$(\w+)\)', document)
+        if aliases:
+            return 200, {}, {'data': {alias: self._repo_node(variables.get('owner'), variables.get(name))
+                                      for alias, name in aliases}}
+        return 200, {}, {'errors': [{'message': 'Unsupported query'}]}
+
+    def _run_node(self, node_id):
+        run = next((run for run in self.runs.values() if run['node_id'] == node_id and not run['deleted']), None)
+        if run is None:
+            return None
+        status, conclusion = self.status(run)
+        return {'id': node_id, 'databaseId': run['id'],
+                'checkSuite': {'status': status.upper(), 'conclusion': conclusion.upper() if conclusion else None}}
+
+    def _repo_node(self, owner, name):
+        repo = self.repos.get(name) if owner == self.owner else None
+        if repo is None:
+            return None
+        head = repo['refs'][repo['default_branch']]
+        return {
+            'databaseId': repo['id'], 'name': name,
+            'defaultBranchRef': {'name': repo['default_branch'],
+                                 'target': {'oid': head, 'tree': {'oid': self.commits[head]['tree']}}},
+            'workflows': {'entries': [{'name': WORKFLOW_PATH.rsplit('/', 1)[-1], 'path': WORKFLOW_PATH,
+                                       'type': 'blob'}]},
+            'environments': {'nodes': [{'databaseId': environment['id'], 'name': environment['name']}
+                                       for environment in repo['environments'].values()]},
+        }
+
+    def leftovers(self):
+        """
+        Lists what the scans left behind: branches other than the default one, runs not deleted and
+        environments not back to their original config.
+        Returns: (dict) Repository name mapped to its leftovers, only for repositories with some.
+        """
+        with self._lock:
+            result = {}
+            for name, repo in self.repos.items():
+                leftover = {
+                    'branches': sorted(branch for branch in repo['refs'] if branch != repo['default_branch']),
+                    'runs': sorted(run['id'] for run in self.runs.values()
+                                   if run['repo'] == name and not run['deleted']),
+                    'environments': json.dumps(repo['environments'], sort_keys=True) != repo['original_environments'],
+                }
+                if any(leftover.values()):
+                    result[name] = leftover
+            return result
+
+    def leaked_repos(self):
+        """
+        Returns the names of the repositories holding LEAKED_KEY.
+        Returns: (list) Repository names.
+        """
+        return sorted(name for name, repo in self.repos.items() if repo['leaked'])
+
+
+class FakeGithubServer(ThreadingHTTPServer):
+    # The scans open a whole connection pool at once, more than the default backlog of 5.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _answer(self):
+        github = self.server.github
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if github.latency:
+            time.sleep(github.latency)
+        status, headers, answer = github.handle(self.command, self.path, dict(self.headers), body)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _answer
+
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from benchmark import run_benchmark
+from fake_github import LEAKED_KEY, FakeGithub
+from services.github_client import GithubClient
+from services.http_cache import HttpCache
+from services.retry_policy import RetryPolicy
+
+FAST_SCAN = {'WRITE_INTERVAL': '0', 'RUN_POLL_INTERVAL': '0.2', 'RUN_MONITOR_INTERVAL': '0.2',
+             'SCAN_CONCURRENCY': '4'}
+
+
+@pytest.fixture
+def github():
+    with FakeGithub(repos=5, queue_delay=0.1, run_delay=0.1) as github:
+        yield github
+
+
+@pytest.fixture
+def client(github, tmp_path):
+    yield GithubClient('token', api_url=github.url, cache=HttpCache(str(tmp_path)),
+                       retry_policy=RetryPolicy(retries=0))
+
+
+def test_paginates_and_revalidates(github, client):
+    url = f'{client.api_url}/users/bench/repos'
+    names = sorted(repo['name'] for repo in client.paginate(url, per_page=2, cache=True))
+    assert names == sorted(github.repos)
+    remaining = github.remaining['core']
+    assert len(list(client.paginate(url, per_page=2, cache=True))) == 5
+    statuses = {call['endpoint']: call['statuses'] for call in client.metrics.report()['calls']}
+    assert statuses['/users/{owner}/repos'] == {'200': 3, '304': 3}
+    assert github.remaining['core'] == remaining
+
+
+def test_run_waits_for_approval(github, client):
+    repo_url = f'{client.api_url}/repos/bench/repo-0000'
+    head = client.get(f'{repo_url}/commits/HEAD').json()
+    client.post(f'{repo_url}/git/refs', json={'ref': 'refs/heads/scan', 'sha': head['sha']})
+    for env in ('st', 'pr'):
+        client.put(f'{repo_url}/environments/{env}', json={
+            'wait_timer': 0, 'reviewers': [{'type': 'User', 'id': 1}],
+            'deployment_branch_policy': {'protected_branches': False, 'custom_branch_policies': True}})
+        client.post(f'{repo_url}/environments/{env}/deployment-branch-policies', json={'name': 'scan'})
+    response = client.post(f'{repo_url}/actions/workflows/ci.yml/dispatches', json={
+        'ref': 'scan', 'inputs': {'access_key_ids': LEAKED_KEY, 'filter_secret_pattern': '^AWS_ACCESS'}})
+    assert response.status_code == 204
+    run = client.get(f'{repo_url}/actions/workflows/ci.yml/runs', params={'branch': 'scan'}).json()['workflow_runs'][0]
+    time.sleep(0.15)
+    assert client.get(f'{repo_url}/actions/runs/{run["id"]}').json()['status'] == 'waiting'
+    pending = client.get(f'{repo_url}/actions/runs/{run["id"]}/pending_deployments').json()
+    client.post(f'{repo_url}/actions/runs/{run["id"]}/pending_deployments', json={
+        'environment_ids': [deployment['environment']['id'] for deployment in pending], 'state': 'approved'})
+    time.sleep(0.15)
+    nodes = client.graphql('query($ids: [ID!]!) { nodes(ids: $ids) { id } }', {'ids': [run['node_id']]})['nodes']
+    assert nodes[0]['checkSuite'] == {'status': 'COMPLETED', 'conclusion': 'SUCCESS'}
+    artifacts = client.get(f'{repo_url}/actions/runs/{run["id"]}/artifacts').json()['artifacts']
+    assert sorted(artifact['name'] for artifact in artifacts) == [
+        'secret-results-pr', 'secret-results-qa', 'secret-results-st']
+
+
+def test_benchmark_scans_every_repo():
+    result = run_benchmark(repos=4, queue_delay=0.2, run_delay=0.2, settings=FAST_SCAN, timeout=120)
+    assert result['scanned'] == 4
+    assert result['leaks_found'] == result['leaks_expected'] == ['repo-0000', 'repo-0003']
+    assert result['leftovers'] == {}
+    assert result['api_calls_per_repo'] > 0
+    assert result['repo_p95'] >= result['repo_p50'] > 0
@@ -0,0 +1,40 @@
+import hashlib
+import hmac
+
+import pytest
+
+from services.fingerprint_index import FingerprintIndex
+
+
+@pytest.fixture
+def fingerprint_index(tmp_path):
+    fingerprint_index = FingerprintIndex(str(tmp_path / 'fingerprints.json'))
+    fingerprint_index.reset()
+    yield fingerprint_index
+
+
+def workflow_fingerprint(salt, value):
+    return hmac.new(salt.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+
+def test_lookup_matches_workflow_fingerprints(fingerprint_index):
+    salt = fingerprint_index.salt
+    fingerprint_index.replace_repo('api', {'pr': {'AWS_KEY': workflow_fingerprint(salt, 'AKIA1')}})
+    fingerprint_index.replace_repo('web', {'st': {'AWS_ID': workflow_fingerprint(salt, 'AKIA2')}})
+    assert fingerprint_index.lookup('AKIA1') == [('api', 'pr', 'AWS_KEY')]
+    assert fingerprint_index.lookup('AKIA3') == []
+
+
+def test_shared_reports_values_in_several_repos(fingerprint_index):
+    value = workflow_fingerprint(fingerprint_index.salt, 'AKIA1')
+    fingerprint_index.replace_repo('api', {'pr': {'AWS_KEY': value}, 'st': {'AWS_KEY': value}})
+    assert fingerprint_index.shared() == []
+    fingerprint_index.replace_repo('web', {'pr': {'KEY': value}})
+    assert len(fingerprint_index.shared()[0]) == 3
+
+
+def test_save_and_reload(fingerprint_index):
+    fingerprint_index.replace_repo('api', {'pr': {'AWS_KEY': fingerprint_index.fingerprint('AKIA1')}})
+    fingerprint_index.save()
+    reloaded = FingerprintIndex(fingerprint_index.path)
+    assert reloaded.lookup('AKIA1') == [('api', 'pr', 'AWS_KEY')]
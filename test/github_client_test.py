@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from services.github_client import GithubClient
+from services.http_cache import HttpCache
+from services.retry_policy import RetryPolicy
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    failures = {}
+
+    def do_GET(self):
+        if self.path.startswith('/items'):
+            return self.send_page()
+        if self.path.startswith('/flaky') and OkHandler.failures.setdefault(self.path, 0) < 2:
+            OkHandler.failures[self.path] += 1
+            self.send_response(502)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path.startswith('/slow') and OkHandler.failures.setdefault(self.path, 0) < 1:
+            OkHandler.failures[self.path] += 1
+            time.sleep(1)
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = b'{"name": "repo"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        OkHandler.failures[self.path] = OkHandler.failures.get(self.path, 0) + 1
+        self.send_response(502)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def send_page(self):
+        page = int(parse_qs(urlparse(self.path).query)['page'][0])
+        body = json.dumps([page * 10 + i for i in range(2)]).encode()
+        self.send_response(200)
+        self.send_header('Link', f'<http://{self.headers["Host"]}/items?per_page=2&page=3>; rel="last"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), OkHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def test_reuses_connections(server):
+    host = f'127.0.0.1:{server.server_port}'
+    client = GithubClient('token', api_url=f'http://{host}', pool_size=2, cache=False)
+    for _ in range(3):
+        assert client.get(f'{client.api_url}/rate_limit').status_code == 200
+    stats = client.connection_stats()[host]
+    assert stats['requests'] == 3
+    assert client.metrics.report()['calls'][0]['latency']['count'] == 3
+    assert stats['connections_opened'] == 1
+
+
+def test_shared_client_per_token():
+    assert GithubClient.shared('a') is GithubClient.shared('a')
+    assert GithubClient.shared('a') is not GithubClient.shared('b')
+
+
+def test_revalidates_cached_listing(server, tmp_path):
+    cache = HttpCache(path=str(tmp_path), ttl=60, max_entries=10)
+    client = GithubClient('token', api_url=f'http://127.0.0.1:{server.server_port}', cache=cache)
+    url = f'{client.api_url}/repos/owner/repo'
+    first = client.get(url, cache=True)
+    second = client.get(url, cache=True)
+    assert not getattr(first, 'from_cache', False)
+    assert second.from_cache
+    assert second.json() == {'name': 'repo'}
+    assert not getattr(client.get(url, cache=True, refresh=True), 'from_cache', False)
+
+
+def test_paginate_fetches_every_page(server):
+    client = GithubClient('token', api_url=f'http://127.0.0.1:{server.server_port}', cache=False)
+    items = list(client.paginate(f'{client.api_url}/items', per_page=2))
+    assert sorted(items) == [10, 11, 20, 21, 30, 31]
+
+
+def test_retries_transient_errors(server):
+    retry_policy = RetryPolicy(retries=3, backoff=0)
+    client = GithubClient('token', api_url=f'http://127.0.0.1:{server.server_port}', cache=False,
+                          retry_policy=retry_policy)
+    assert client.get(f'{client.api_url}/flaky/get').status_code == 200
+    assert client.post(f'{client.api_url}/flaky/post').status_code == 502
+    assert OkHandler.failures['/flaky/post'] == 1
+
+
+def test_hedges_slow_get(server):
+    retry_policy = RetryPolicy(hedge_after=0.1)
+    client = GithubClient('token', api_url=f'http://127.0.0.1:{server.server_port}', cache=False,
+                          retry_policy=retry_policy)
+    started = time.monotonic()
+    assert client.get(f'{client.api_url}/slow/get').json() == {'name': 'repo'}
+    assert time.monotonic() - started < 0.9
+    assert client.connection_stats()[f'127.0.0.1:{server.server_port}']['hedged'] == 1
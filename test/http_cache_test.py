@@ -0,0 +1,40 @@
+import time
+
+import pytest
+import requests
+
+from services.http_cache import HttpCache
+
+
+def make_response(etag='"abc"', body='[]'):
+    response = requests.Response()
+    response.status_code = 200
+    response.headers['ETag'] = etag
+    response._content = body.encode()
+    return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    yield HttpCache(path=str(tmp_path), ttl=60, max_entries=3)
+
+
+def test_stores_entries_by_url_and_params(cache):
+    cache.set('https://api.github.com/orgs/o/repos', {'page': 1}, make_response(body='[1]'))
+    assert cache.get('https://api.github.com/orgs/o/repos', {'page': 1})['body'] == '[1]'
+    assert cache.get('https://api.github.com/orgs/o/repos', {'page': 2}) is None
+
+
+def test_expired_entries_are_dropped(cache):
+    cache.set('https://api.github.com/user', None, make_response())
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.get('https://api.github.com/user') is None
+
+
+def test_evicts_oldest_entries(cache):
+    for page in range(5):
+        cache.set('https://api.github.com/orgs/o/repos', {'page': page}, make_response())
+        time.sleep(0.01)
+    assert len(cache._entry_files()) <= 3
+    assert cache.get('https://api.github.com/orgs/o/repos', {'page': 4}) is not None
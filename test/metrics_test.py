@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from services.metrics import Metrics, endpoint_template, summarize
+
+
+@pytest.fixture
+def metrics():
+    yield Metrics()
+
+
+def test_endpoint_template():
+    base = 'https://api.github.com'
+    assert endpoint_template(f'{base}/repos/me/api/actions/runs/123/jobs?page=2') == \
+        '/repos/{owner}/{repo}/actions/runs/{id}/jobs'
+    assert endpoint_template(f'{base}/repos/me/api/git/refs/heads/scan/branch') == \
+        '/repos/{owner}/{repo}/git/refs/heads/{branch}'
+    assert endpoint_template(f'{base}/repos/me/api/environments/st/deployment-branch-policies/9') == \
+        '/repos/{owner}/{repo}/environments/{environment}/deployment-branch-policies/{id}'
+    assert endpoint_template(f'{base}/repos/me/api/actions/workflows/ci.yml/dispatches') == \
+        '/repos/{owner}/{repo}/actions/workflows/{workflow}/dispatches'
+    assert endpoint_template(f'{base}/orgs/acme/repos') == '/orgs/{owner}/repos'
+
+
+def test_summarize():
+    summary = summarize([float(value) for value in range(1, 101)])
+    assert summary['count'] == 100
+    assert summary['p50'] == 51
+    assert summary['p99'] == 100
+    assert summarize([])['p95'] == 0
+
+
+def test_span_counts_failures(metrics):
+    with metrics.span('provision', 'api'):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.span('provision', 'api'):
+            raise RuntimeError('boom')
+    stage = metrics.report()['stages']['provision']
+    assert stage['failures'] == 1
+    assert stage['latency']['count'] == 2
+
+
+def test_exports_report(metrics, tmp_path):
+    url = 'https://api.github.com/repos/me/api/actions/runs/1'
+    metrics.record_call('GET', url, 200, 0.2, 512, 'core', 4000)
+    metrics.record_call('GET', url.replace('/1', '/2'), 502, 0.4, 0, 'core', 3999)
+    metrics.export(str(tmp_path / 'metrics.json'), str(tmp_path / 'metrics.prom'))
+    with open(tmp_path / 'metrics.json') as file:
+        report = json.load(file)
+    assert report['calls'] == [{'method': 'GET', 'endpoint': '/repos/{owner}/{repo}/actions/runs/{id}', 'bytes': 512,
+                                'statuses': {'200': 1, '502': 1},
+                                'latency': summarize([0.2, 0.4])}]
+    assert report['rate_limit'] == {'core': {'remaining': 3999, 'min_remaining': 3999}}
+    text = (tmp_path / 'metrics.prom').read_text()
+    assert ('github_api_requests_total{method="GET",endpoint="/repos/{owner}/{repo}/actions/runs/{id}",status="502"} 1'
+            in text)
+    assert 'github_rate_limit_remaining{resource="core"} 3999' in text
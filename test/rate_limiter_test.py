@@ -0,0 +1,42 @@
+import time
+
+import pytest
+import requests
+
+from services.rate_limiter import RateLimiter
+
+
+def make_response(status_code=200, headers=None, text=''):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.url = 'https://api.github.com/repos/owner/repo'
+    response._content = text.encode()
+    return response
+
+
+@pytest.fixture
+def rate_limiter():
+    yield RateLimiter(reserve=2, write_interval=0)
+
+
+def test_tracks_remaining_budget(rate_limiter):
+    reset = time.time() + 60
+    rate_limiter.update(make_response(headers={
+        'X-RateLimit-Limit': '5000',
+        'X-RateLimit-Remaining': '100',
+        'X-RateLimit-Reset': str(reset),
+        'X-RateLimit-Resource': 'core',
+    }))
+    rate_limiter.acquire('GET', 'https://api.github.com/repos/owner/repo')
+    assert rate_limiter.headroom()['core']['remaining'] == 99
+
+
+def test_retry_after_blocks_requests(rate_limiter):
+    wait = rate_limiter.update(make_response(403, {'Retry-After': '30'}, 'secondary rate limit'))
+    assert wait == 30
+    assert rate_limiter.blocked_until > time.time() + 29
+
+
+def test_other_errors_are_not_retried(rate_limiter):
+    assert rate_limiter.update(make_response(403, {}, 'Resource not accessible by integration')) is None
@@ -1,5 +1,10 @@
+import json
+
 import pytest
+import requests
+
 from services.repo_service import RepoService
+from services.retry_policy import RetryPolicy
 from dotenv import load_dotenv
 import os
 
@@ -32,3 +37,50 @@ def test_filter_repos(repo_service):
 
 def test_update_environment(repo_service):
     repo_service.update_environment(REPO, 'st')
+
+
+class GitDataClient:
+    api_url = 'https://api.github.com'
+    retry_policy = RetryPolicy(retries=0)
+
+    def __init__(self, existing_branch=False):
+        self.existing_branch = existing_branch
+        self.calls = []
+
+    def respond(self, status_code, body):
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body).encode()
+        return response
+
+    def get(self, url, **kwargs):
+        self.calls.append(('GET', url))
+        return self.respond(200, {'sha': 'head', 'commit': {'tree': {'sha': 'base-tree'}}})
+
+    def post(self, url, json=None, **kwargs):
+        self.calls.append(('POST', url))
+        if url.endswith('/trees'):
+            assert json['base_tree'] == 'base-tree'
+            return self.respond(201, {'sha': 'tree'})
+        if url.endswith('/commits'):
+            assert json == {'message': 'Updated workflow', 'tree': 'tree', 'parents': ['head']}
+            return self.respond(201, {'sha': 'commit'})
+        return self.respond(422 if self.existing_branch else 201, {})
+
+    def patch(self, url, json=None, **kwargs):
+        self.calls.append(('PATCH', url))
+        return self.respond(200, {})
+
+
+def test_provision_branch_reads_default_branch_head():
+    client = GitDataClient()
+    commit = RepoService(token, username, client).provision_branch('repo', 'scan', '.github/workflows/ci.yml', 'on: push')
+    assert commit == 'commit'
+    assert client.calls[0] == ('GET', f'https://api.github.com/repos/{username}/repo/commits/HEAD')
+    assert [method for method, _ in client.calls] == ['GET', 'POST', 'POST', 'POST']
+
+
+def test_provision_branch_resets_existing_branch():
+    client = GitDataClient(existing_branch=True)
+    RepoService(token, username, client).provision_branch('repo', 'scan', 'ci.yml', 'on: push', 'head', 'base-tree')
+    assert [method for method, _ in client.calls] == ['POST', 'POST', 'POST', 'PATCH']
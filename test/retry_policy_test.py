@@ -0,0 +1,46 @@
+import pytest
+import requests
+
+from services.retry_policy import RetryPolicy
+
+
+def respond(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return response
+
+
+@pytest.fixture
+def retry_policy():
+    yield RetryPolicy(retries=2, backoff=0, deadline=5)
+
+
+def test_delay_is_bounded():
+    retry_policy = RetryPolicy(backoff=1, max_backoff=3)
+    assert all(0 <= retry_policy.delay(attempt) <= min(3, 2 ** attempt) for attempt in range(6))
+
+
+def test_write_is_not_resent_when_verified(retry_policy):
+    sent = []
+    result = retry_policy.write(lambda: sent.append(1) or respond(502), lambda: True)
+    assert result is None
+    assert len(sent) == 1
+
+
+def test_write_is_resent_when_it_did_not_happen(retry_policy):
+    responses = [respond(502), respond(204)]
+    assert retry_policy.write(lambda: responses.pop(0), lambda: False).status_code == 204
+
+
+def test_write_raises_lost_response(retry_policy):
+    def send():
+        raise requests.exceptions.ConnectionError('reset')
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        retry_policy.write(send, lambda: False)
+
+
+def test_client_errors_are_not_retried(retry_policy):
+    sent = []
+    assert retry_policy.write(lambda: sent.append(1) or respond(422), lambda: False).status_code == 422
+    assert len(sent) == 1
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+
+from entities.run import Run
+from services.run_monitor import RunMonitor
+
+
+class FakeClient:
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def graphql(self, query, variables):
+        with self.lock:
+            self.queries += 1
+            nodes = []
+            for node_id in variables['ids']:
+                status = self.statuses[node_id].pop(0) if len(self.statuses[node_id]) > 1 else self.statuses[node_id][0]
+                nodes.append({'id': node_id, 'checkSuite': {'status': status, 'conclusion': None}})
+            return {'nodes': nodes}
+
+
+@pytest.fixture
+def client():
+    yield FakeClient({
+        'a': ['QUEUED', 'WAITING', 'COMPLETED'],
+        'b': ['QUEUED', 'IN_PROGRESS', 'IN_PROGRESS', 'COMPLETED'],
+        'c': ['QUEUED', 'WAITING', 'WAITING', 'COMPLETED'],
+    })
+
+
+def test_refreshes_all_runs_in_one_query(client):
+    run_monitor = RunMonitor('token', client, interval=0.01)
+    runs = [Run(1, 'queued', node_id='a'), Run(2, 'queued', node_id='b')]
+    results = {}
+    threads = [threading.Thread(target=lambda r=run: results.update({r.id: run_monitor.wait(r, ('completed',))}))
+               for run in runs]
+    [thread.start() for thread in threads]
+    [thread.join(5) for thread in threads]
+    assert results[1].status == results[2].status == 'completed'
+    assert client.queries <= 5
+
+
+def test_wait_stops_at_waiting(client):
+    run_monitor = RunMonitor('token', client, interval=0.01)
+    assert run_monitor.wait(Run(1, 'queued', node_id='a')).status == 'waiting'
+    assert run_monitor.runs == {}
+
+
+def test_on_waiting_runs_once_when_run_enters_waiting(client):
+    run_monitor = RunMonitor('token', client, interval=0.01)
+    approved = []
+    run = run_monitor.wait(Run(1, 'queued', node_id='a'), ('completed',), on_waiting=approved.append)
+    assert run.status == 'completed'
+    assert [r.id for r in approved] == [1]
+
+
+def test_on_waiting_error_is_raised(client):
+    run_monitor = RunMonitor('token', client, interval=0.01)
+
+    def reject(run):
+        raise RuntimeError('not approved')
+
+    with pytest.raises(RuntimeError):
+        run_monitor.wait(Run(1, 'queued', node_id='a'), ('completed',), on_waiting=reject)
+    assert run_monitor.runs == {}
+
+
+def test_slow_on_waiting_does_not_block_refreshes(client):
+    run_monitor = RunMonitor('token', client, interval=0.01)
+    released = threading.Event()
+    results = {}
+
+    def slow_approval(run):
+        released.wait(5)
+
+    waiter = threading.Thread(target=lambda: results.update(
+        c=run_monitor.wait(Run(3, 'queued', node_id='c'), ('completed',), on_waiting=slow_approval)))
+    waiter.start()
+    assert run_monitor.wait(Run(2, 'queued', node_id='b'), ('completed',), deadline=2).status == 'completed'
+    released.set()
+    waiter.join(5)
+    assert results['c'].status == 'completed'
@@ -1,4 +1,9 @@
+import io
+import json
+import zipfile
+
 import pytest
+import requests
 
 from services.run_service import RunService
 from services.workflow_service import WorkflowService
@@ -49,3 +54,34 @@ def test_approve_deployment(run_service, workflow_service):
 def test_list_environments(run_service):
     response = run_service.list_environments(REPO)
     logger.info(response)
+
+
+class ArtifactClient:
+    api_url = 'https://api.github.com'
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+
+    def paginate(self, url, key=None, **kwargs):
+        return [{'name': f'secret-results-{env}', 'archive_download_url': env} for env in self.payloads]
+
+    def get(self, url, **kwargs):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr(f'{url}.json', json.dumps(self.payloads[url]))
+        response = requests.Response()
+        response.status_code = 200
+        response._content = buffer.getvalue()
+        return response
+
+
+def test_get_results_decodes_artifacts():
+    client = ArtifactClient({
+        'qa': {'environment': 'qa', 'secrets': {'AWS_KEY': [True, False], 'DB_KEY': [False, False]}},
+        'pr': {'environment': 'pr', 'secrets': {}},
+    })
+    results = RunService(token, username, client).get_results(REPO, 1, ['AK1', 'AK2'])
+    assert results == {
+        'AK1': {'qa': {'AWS_KEY': True, 'DB_KEY': False}, 'pr': {}},
+        'AK2': {'qa': {'AWS_KEY': False, 'DB_KEY': False}, 'pr': {}},
+    }
@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from services.run_tracker import RunTracker
+
+
+class FakeRunService:
+
+    def __init__(self):
+        self.calls = 0
+
+    def list_runs(self, repo, workflow_id, branch=None, event=None, created=None):
+        self.calls += 1
+        if self.calls < 2:
+            return []
+        return [
+            {'id': 2, 'status': 'queued', 'created_at': '2023-06-01T10:00:09Z'},
+            {'id': 1, 'status': 'queued', 'created_at': '2023-06-01T10:00:03Z'},
+        ]
+
+
+@pytest.fixture
+def run_service():
+    yield FakeRunService()
+
+
+@pytest.fixture
+def run_tracker(run_service):
+    yield RunTracker(run_service, initial_interval=0.01, max_interval=0.02, deadline=1)
+
+
+def test_find_run_picks_oldest_run_after_dispatch(run_tracker):
+    run = run_tracker.find_run('repo', 'secret.yml', 'scan', datetime(2023, 6, 1, 10, 0, tzinfo=timezone.utc))
+    assert run.id == 1
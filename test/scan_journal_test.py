@@ -0,0 +1,58 @@
+import pytest
+
+from services.scan_journal import ScanJournal
+
+
+@pytest.fixture
+def path(tmp_path):
+    yield str(tmp_path / 'journal.jsonl')
+
+
+def test_replays_stages(path):
+    journal = ScanJournal(path)
+    journal.reset('scan-1')
+    journal.record('api', 'provisioned', workflow_id=1)
+    journal.record('api', 'run', run_id=7)
+    journal.record('web', 'done', results={'AK1': {}})
+    replayed = ScanJournal(path)
+    assert replayed.scan_key == 'scan-1'
+    assert replayed.state('api') == {'stage': 'run', 'stages': ['provisioned', 'run'], 'workflow_id': 1, 'run_id': 7}
+    assert list(replayed.unfinished()) == ['api']
+    assert ScanJournal.reached(replayed.state('web'), 'done')
+    assert not ScanJournal.reached(replayed.state('api'), 'results')
+
+
+def test_done_repo_is_unfinished_until_cleaned(path):
+    journal = ScanJournal(path)
+    journal.reset('scan-1')
+    journal.record('api', 'provisioned')
+    journal.record('api', 'results', results={})
+    journal.record('api', 'done', results={})
+    assert list(journal.unfinished()) == ['api']
+    journal.record('api', 'cleaned')
+    assert journal.unfinished() == {}
+
+
+def test_abandoned_repo_is_forgotten(path):
+    journal = ScanJournal(path)
+    journal.reset('scan-1')
+    journal.record('api', 'provisioned')
+    journal.record('api', 'abandoned')
+    assert ScanJournal(path).state('api') is None
+
+
+def test_ignores_truncated_line(path):
+    journal = ScanJournal(path)
+    journal.reset('scan-1')
+    journal.record('api', 'results', results={})
+    with open(path, 'a') as file:
+        file.write('{"repo": "api", "sta')
+    assert ScanJournal(path).state('api')['stage'] == 'results'
+
+
+def test_reset_starts_a_new_scan(path):
+    journal = ScanJournal(path)
+    journal.reset('scan-1')
+    journal.record('api', 'done', results={})
+    journal.reset('scan-2')
+    assert ScanJournal(path).repos == {}
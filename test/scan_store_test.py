@@ -0,0 +1,48 @@
+import pytest
+
+from services.scan_store import ScanStore
+
+METADATA = {'repo': {'AWS_KEY': '2023-06-01T10:00:00Z'}, 'pr': {}}
+
+
+@pytest.fixture
+def scan_store(tmp_path):
+    yield ScanStore(str(tmp_path / 'scans.db'))
+
+
+def test_reuses_results_while_metadata_is_unchanged(scan_store):
+    metadata_hash = scan_store.metadata_hash(METADATA, '^AWS')
+    scan_store.save_results('api', {'AK1': {'pr': {'AWS_KEY': True}}}, metadata_hash)
+    assert scan_store.get_results('api', ['AK1', 'AK2'], metadata_hash) == {'AK1': {'pr': {'AWS_KEY': True}}}
+
+
+def test_updated_secret_invalidates_results(scan_store):
+    scan_store.save_results('api', {'AK1': {}}, scan_store.metadata_hash(METADATA, '^AWS'))
+    updated = {**METADATA, 'repo': {'AWS_KEY': '2023-07-01T10:00:00Z'}}
+    assert scan_store.get_results('api', ['AK1'], scan_store.metadata_hash(updated, '^AWS')) == {}
+    assert scan_store.get_results('api', ['AK1'], scan_store.metadata_hash(METADATA, '^DB')) == {}
+
+
+def test_access_keys_are_not_stored(scan_store):
+    scan_store.save_results('api', {'AK1': {}}, scan_store.metadata_hash(METADATA, '^AWS'))
+    keys = [row[0] for row in scan_store.connection.execute('SELECT access_key FROM results')]
+    assert keys == [scan_store.key_digest('AK1')]
+
+
+def test_drops_results_stored_under_plain_keys(tmp_path):
+    path = str(tmp_path / 'scans.db')
+    scan_store = ScanStore(path)
+    with scan_store.connection:
+        scan_store.connection.execute("INSERT INTO results VALUES ('api', 'AK1', 'hash', '{}', 0)")
+    assert ScanStore(path).connection.execute('SELECT COUNT(*) FROM results').fetchone() == (0,)
+
+
+def test_warm_branches(scan_store):
+    assert scan_store.get_warm_branch('repo-a') is None
+    environments = {'st': {'original': {'exists': False}, 'updated': True, 'created_policy': 7}}
+    scan_store.save_warm_branch('repo-a', 'scan', '.github/workflows/ci.yml', 'abc', environments)
+    assert scan_store.get_warm_branch('repo-a') == {'branch': 'scan', 'workflow_path': '.github/workflows/ci.yml',
+                                                    'blob_sha': 'abc', 'environments': environments}
+    assert list(scan_store.list_warm_branches()) == ['repo-a']
+    scan_store.delete_warm_branch('repo-a')
+    assert scan_store.list_warm_branches() == {}